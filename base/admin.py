@@ -1,9 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import (CustomUser, AcademicProfile, TeacherProfile, 
+from django.core.paginator import Paginator
+from django.http import QueryDict
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import (CustomUser, AcademicProfile, TeacherProfile,
                      Subject, Medium, TeachingMode, Availability,
-                     Qualification,Grade,
+                     Qualification,Grade,Job,PendingVerification,
+                     ChangeLogEntry,Booking,
                      )
+from . import eligibility
+from .sync import log_changes
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -17,27 +26,218 @@ class CustomUserAdmin(UserAdmin):
 admin.site.register(CustomUser, CustomUserAdmin)
 
 admin.site.register(Grade)
-class AcademicProfileInline(admin.StackedInline):
-    model = AcademicProfile
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Returns the database's cheap estimate of the number of rows in the
+    model's table, or None when the backend has no such estimate.
+    """
+    table = model._meta.db_table
+    connection = connections[using]
+    quoted = connection.ops.quote_name(table)
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [quoted]),
+        'mysql': (
+            "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            [table],
+        ),
+        # Ignores deleted rows, but reading the last rowid is O(1).
+        'sqlite': (f"SELECT MAX(rowid) FROM {quoted}", []),
+    }
+    if connection.vendor not in queries:
+        return None
+    sql, params = queries[connection.vendor]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the table statistics instead of COUNT(*) for unfiltered querysets of
+    large tables, where an exact count costs a full scan.
+    """
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset showing one page of related objects at a time.
+    """
+    per_page = 10
+    page_number = 1
+    # Query parameters of the change form, kept by the page links.
+    query = QueryDict()
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.page = Paginator(queryset, self.per_page).get_page(self.page_number)
+            if self.is_bound:
+                # Only the rows of the page that was rendered come back, and
+                # the page may have shifted since; bind them by their ids.
+                self._queryset = queryset.filter(pk__in=self._posted_ids())
+            else:
+                self._queryset = self.page.object_list
+        return self._queryset
+
+    def _posted_ids(self):
+        pk_name = self.model._meta.pk.name
+        ids = (self.data.get(f"{self.prefix}-{index}-{pk_name}", '') for index in range(self.initial_form_count()))
+        return [int(pk) for pk in ids if pk.isdigit()]
+
+    def _page_query(self, number):
+        query = self.query.copy()
+        query[f"{self.prefix}_page"] = number
+        return query.urlencode()
+
+    @property
+    def previous_page_query(self):
+        return self._page_query(self.page.previous_page_number())
+
+    @property
+    def next_page_query(self):
+        return self._page_query(self.page.next_page_number())
+
+
+class PaginatedStackedInline(admin.StackedInline):
+    """
+    Stacked inline paginated through the `<prefix>_page` query parameter,
+    so tutors with many related rows keep a small change form.
+    """
+    formset = PaginatedInlineFormSet
+    template = 'admin/edit_inline/paginated_stacked.html'
+    per_page = 10
     extra = 0
+    # Related rows rendered with __str__ walk up to the user.
+    related_user = 'teacher__user'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(self.related_user)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        try:
+            formset.page_number = int(request.GET.get(f"{formset.get_default_prefix()}_page", 1))
+        except ValueError:
+            formset.page_number = 1
+        formset.query = request.GET
+        return formset
+
+
+class AcademicProfileInline(PaginatedStackedInline):
+    model = AcademicProfile
 
-class AvailabilityInline(admin.StackedInline):
+class AvailabilityInline(PaginatedStackedInline):
     model = Availability
-    extra = 0
+    related_user = 'tutor__user'
+    # The model ordering joins through tutor__user, not needed per tutor.
+    ordering = ('day_of_week', 'start_time')
 
-class QualificationInline(admin.StackedInline):
+class QualificationInline(PaginatedStackedInline):
     model = Qualification
-    extra = 0
+
+
+# Keeps IN (...) lists of bulk actions below every backend's parameter limit.
+BULK_BATCH_SIZE = 500
+
+
+@admin.action(description="Verify selected teachers", permissions=['change'])
+def verify_teachers(modeladmin, request, queryset):
+    teacher_ids = list(queryset.filter(verified=False).values_list('pk', flat=True))
+    updated = 0
+    for start in range(0, len(teacher_ids), BULK_BATCH_SIZE):
+        batch = teacher_ids[start:start + BULK_BATCH_SIZE]
+        updated += TeacherProfile.objects.filter(pk__in=batch).update(verified=True, updated_at=timezone.now())
+        # update() bypasses the signals feeding the sync change log and
+        # the eligibility flags.
+        log_changes(ChangeLogEntry.TEACHER, batch)
+        eligibility.refresh(batch)
+    modeladmin.message_user(request, f"{updated} teacher profiles verified.", messages.SUCCESS)
+
+
+@admin.action(description="Ban selected teachers", permissions=['change'])
+def ban_teachers(modeladmin, request, queryset):
+    teacher_ids = list(queryset.values_list('pk', flat=True))
+    updated = 0
+    for start in range(0, len(teacher_ids), BULK_BATCH_SIZE):
+        batch = teacher_ids[start:start + BULK_BATCH_SIZE]
+        updated += CustomUser.objects.filter(teacher_profile__in=batch).update(banned=True)
+        eligibility.refresh(batch)
+    modeladmin.message_user(request, f"{updated} teachers banned.", messages.SUCCESS)
+
 
 class TeacherProfileAdmin(admin.ModelAdmin):
     inlines = [AcademicProfileInline, AvailabilityInline, QualificationInline]
+    list_display = ('username', 'email', 'verified', 'banned', 'is_searchable', 'completeness_score', 'gender', 'experience_years')
+    list_select_related = ('user',)
+    list_filter = ('verified', 'user__banned', 'is_searchable', 'gender')
+    search_fields = ('^user__username', '=user__email')
+    actions = [verify_teachers, ban_teachers]
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(ordering='user__username')
+    def username(self, obj):
+        return obj.user.username
+
+    @admin.display(ordering='user__email')
+    def email(self, obj):
+        return obj.user.email
+
+    @admin.display(boolean=True, ordering='user__banned')
+    def banned(self, obj):
+        return obj.user.banned
+
+
+class VerificationQueueAdmin(TeacherProfileAdmin):
+    """
+    Unverified, non-banned teachers, oldest first. The list is served by the
+    partial index on unverified profiles and one join to the user table.
+    """
+    list_display = ('username', 'email', 'gender', 'experience_years')
+    list_filter = ('gender',)
+    ordering = ('pk',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(verified=False, user__banned=False)
+
+    def has_add_permission(self, request):
+        return False
+
 
 admin.site.register(TeacherProfile, TeacherProfileAdmin)
+admin.site.register(PendingVerification, VerificationQueueAdmin)
 admin.site.register(Subject)
 admin.site.register(Medium)
 admin.site.register(TeachingMode)
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'priority', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('=idempotency_key', 'task')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
 
 
-
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tutor', 'student', 'date', 'start_time', 'end_time', 'status')
+    list_select_related = ('tutor__user', 'student')
+    list_filter = ('status',)
+    raw_id_fields = ('tutor', 'student')
+    date_hierarchy = 'date'
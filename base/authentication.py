@@ -1,26 +1,192 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import cache
 from rest_framework.authentication import BaseAuthentication
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from rest_framework_simplejwt import authentication as jwt_authentication
+from django.conf import settings
 from django.contrib.auth import get_user_model
 import os
-from dotenv import load_dotenv
-load_dotenv()
+
+from .metrics import TimedAuthenticationMixin, registry
 
 User = get_user_model()
 
-class GoogleIDTokenAuthentication(BaseAuthentication):
+JWT_CACHE_DEFAULTS = {
+    # Validated access tokens kept per process (least recently used dropped).
+    'CLAIMS_MAX_ENTRIES': 10000,
+    # Seconds a refresh result is handed to repeated refreshes of the same
+    # refresh token.
+    'REFRESH_RESULT_TTL': 5.0,
+    # Seconds a duplicate refresh waits for the one in progress.
+    'REFRESH_WAIT_TIMEOUT': 5.0,
+}
+
+
+def get_config():
+    config = dict(JWT_CACHE_DEFAULTS)
+    config.update(getattr(settings, 'JWT_CACHE', {}))
+    return config
+
+
+def token_digest(raw_token):
+    if isinstance(raw_token, str):
+        raw_token = raw_token.encode()
+    return hashlib.sha256(raw_token).digest()
+
+
+class ClaimsCache:
+    """
+    LRU map of token digest -> validated token, each entry valid until the
+    token's own expiry. Keys are digests so raw tokens are never retained.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        validated_token, expires_at = entry
+        if time.time() >= expires_at:
+            with self._lock:
+                self._entries.pop(digest, None)
+            return None
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+        return validated_token
+
+    def set(self, digest, validated_token):
+        expires_at = validated_token.payload.get('exp')
+        if expires_at is None:
+            return
+        max_entries = get_config()['CLAIMS_MAX_ENTRIES']
+        with self._lock:
+            self._entries[digest] = (validated_token, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.value = None
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time: concurrent callers with the same
+    key wait for the running call and share its result, which is also
+    reused for REFRESH_RESULT_TTL seconds. Failures are not shared; waiting
+    callers then compute on their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._results = {}
+
+    def do(self, key, func):
+        """Returns (value, shared) where `shared` tells whether another call computed it."""
+        config = get_config()
+        with self._lock:
+            now = time.monotonic()
+            result = self._results.get(key)
+            if result is not None and result[0] > now:
+                return result[1], True
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if call.done.wait(config['REFRESH_WAIT_TIMEOUT']) and call.ok:
+                return call.value, True
+            return func(), False
+        try:
+            call.value = func()
+            call.ok = True
+            with self._lock:
+                now = time.monotonic()
+                self._results = {k: v for k, v in self._results.items() if v[0] > now}
+                self._results[key] = (now + config['REFRESH_RESULT_TTL'], call.value)
+            return call.value, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+refresh_flight = SingleFlight()
+
+
+@cache
+def _google_verifier():
+    """
+    Imports the google-auth dependencies and loads .env on first use only.
+
+    This module is imported on every worker boot and manage.py run through
+    DRF's authentication settings, while the Google backend is optional.
+    Returns (id_token module, transport Request class, client id).
+    """
+    from google.oauth2 import id_token
+    from google.auth.transport import requests
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return id_token, requests.Request, os.getenv("GOOGLE_CLIENT_ID")
+
+
+class JWTAuthentication(TimedAuthenticationMixin, jwt_authentication.JWTAuthentication):
+    """
+    simplejwt authentication with its timing recorded in the metrics registry.
+    Validated tokens are cached per token digest until they expire, so a
+    client reusing its access token skips the signature check and claim
+    decoding. The user is still loaded on every request.
+    """
+
+    def get_validated_token(self, raw_token):
+        digest = token_digest(raw_token)
+        validated_token = claims_cache.get(digest)
+        if validated_token is not None:
+            registry.inc('tutoria_jwt_claims_cache_total', (('result', 'hit'),))
+            return validated_token
+        registry.inc('tutoria_jwt_claims_cache_total', (('result', 'miss'),))
+        validated_token = super().get_validated_token(raw_token)
+        claims_cache.set(digest, validated_token)
+        return validated_token
+
+
+class GoogleIDTokenAuthentication(TimedAuthenticationMixin, BaseAuthentication):
     def authenticate(self, request):
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
             return None
 
         token = auth_header.split(" ")[1]
+        id_token, transport_request, client_id = _google_verifier()
 
         try:
             idinfo = id_token.verify_oauth2_token(
                 token,
-                requests.Request(),
-                audience=os.getenv("GOOGLE_CLIENT_ID")  
+                transport_request(),
+                audience=client_id
             )
 
             if not idinfo.get("email_verified", False):
@@ -0,0 +1,200 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from .taxonomy import get_taxonomy
+
+# Bangla script to Latin. Consonants carry an inherent vowel ("o") that is
+# written out only between consonants, see transliterate().
+BANGLA_VOWELS = {
+    'অ': 'o', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri',
+    'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou',
+}
+BANGLA_VOWEL_SIGNS = {
+    'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri',
+    'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou',
+}
+BANGLA_CONSONANTS = {
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng',
+    'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n',
+    'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'ph', 'ব': 'b', 'ভ': 'bh', 'ম': 'm',
+    'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh', 'স': 's', 'হ': 'h',
+    'ড়': 'r', 'ঢ়': 'rh', 'য়': 'y', 'ৎ': 't',
+}
+BANGLA_SIGNS = {'ং': 'ng', 'ঃ': 'h', 'ঁ': '', '়': ''}
+HASANTA = '্'
+BANGLA_DIGITS = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+
+# Spelling-insensitive key shared by English and transliterated Bangla, so
+# "physics" and "ফিজিক্স" both become "fisiks".
+PHONETIC_RULES = [
+    ('ph', 'f'), ('sh', 's'), ('chh', 'k'), ('ch', 'k'), ('kh', 'k'), ('gh', 'g'),
+    ('th', 't'), ('dh', 'd'), ('bh', 'b'), ('jh', 'j'), ('ck', 'k'),
+    ('ee', 'i'), ('oo', 'u'), ('q', 'k'), ('x', 'ks'), ('c', 'k'),
+    ('z', 's'), ('j', 's'), ('y', 'i'), ('v', 'b'), ('w', 'o'),
+]
+NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+REPEATED_RE = re.compile(r'(.)\1+')
+
+# Above this many new keys a refresh re-sorts instead of inserting one by one.
+BULK_REBUILD_THRESHOLD = 256
+
+# Match quality, lower ranks first.
+RANK_NAME, RANK_WORD, RANK_CODE, RANK_PHONETIC = range(4)
+
+Suggestion = namedtuple('Suggestion', ['kind', 'id', 'name', 'code', 'grade_id'])
+
+
+def transliterate(text):
+    """Converts Bangla script in `text` to Latin letters, leaving the rest alone."""
+    text = unicodedata.normalize('NFC', text).translate(BANGLA_DIGITS)
+    output = []
+    for index, char in enumerate(text):
+        if char == 'য' and index and text[index - 1] == HASANTA:
+            # Ya-phala (্য) mostly changes the vowel sound, it adds no letter.
+            continue
+        if char in BANGLA_CONSONANTS:
+            output.append(BANGLA_CONSONANTS[char])
+            following = text[index + 1] if index + 1 < len(text) else ''
+            if following in BANGLA_CONSONANTS:
+                output.append('o')
+        elif char == HASANTA:
+            continue
+        elif char in BANGLA_VOWEL_SIGNS:
+            output.append(BANGLA_VOWEL_SIGNS[char])
+        elif char in BANGLA_VOWELS:
+            output.append(BANGLA_VOWELS[char])
+        elif char in BANGLA_SIGNS:
+            output.append(BANGLA_SIGNS[char])
+        else:
+            output.append(char)
+    return ''.join(output)
+
+
+def fold(text):
+    """Case-folds, transliterates and strips accents and punctuation."""
+    text = unicodedata.normalize('NFKD', transliterate(text).casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return NON_ALNUM_RE.sub(' ', text).strip()
+
+
+def phonetic(folded):
+    key = folded.replace(' ', '')
+    for source, target in PHONETIC_RULES:
+        key = key.replace(source, target)
+    return REPEATED_RE.sub(r'\1', key)
+
+
+def index_keys(name, code=None):
+    """Yields (key, rank) pairs an entry is findable by."""
+    folded = fold(name)
+    if folded:
+        yield folded, RANK_NAME
+        for word in folded.split()[1:]:
+            yield word, RANK_WORD
+        for word in folded.split():
+            yield phonetic(word), RANK_PHONETIC
+    if code:
+        yield fold(code).replace(' ', ''), RANK_CODE
+
+
+class PrefixIndex:
+    """
+    Sorted arrays of (key, entry key) tuples, one per suggestion kind and
+    match rank; a prefix lookup is a binary search followed by a scan of
+    the matching keys. Rebuilt incrementally from the taxonomy snapshot:
+    only entries that changed are re-indexed.
+    """
+
+    def __init__(self):
+        self.version = None
+        # ({(kind, rank): sorted keys}, {entry key: Suggestion}), swapped as one object.
+        self._state = ({}, {})
+        self._lock = threading.Lock()
+
+    def _snapshot_entries(self, taxonomy):
+        entries = {}
+        for subject in taxonomy.subjects.values():
+            entries[('subject', subject.id)] = Suggestion('subject', subject.id, subject.name, subject.code, subject.grade_id)
+        for grade in taxonomy.grades.values():
+            entries[('grade', grade.id)] = Suggestion('grade', grade.id, grade.name, None, None)
+        return entries
+
+    def refresh(self):
+        taxonomy = get_taxonomy()
+        if taxonomy.version == self.version:
+            return
+        with self._lock:
+            if taxonomy.version == self.version:
+                return
+            old_buckets, old_entries = self._state
+            new_entries = self._snapshot_entries(taxonomy)
+            changed = {
+                entry_key for entry_key in old_entries.keys() | new_entries.keys()
+                if old_entries.get(entry_key) != new_entries.get(entry_key)
+            }
+            additions = {}
+            for entry_key in changed:
+                if entry_key in new_entries:
+                    entry = new_entries[entry_key]
+                    for key, rank in set(index_keys(entry.name, entry.code)):
+                        additions.setdefault((entry_key[0], rank), []).append((key, entry_key))
+            buckets = {}
+            for bucket in old_buckets.keys() | additions.keys():
+                kept = [item for item in old_buckets.get(bucket, ()) if item[1] not in changed]
+                added = additions.get(bucket, [])
+                if len(added) > BULK_REBUILD_THRESHOLD:
+                    kept = sorted(kept + added)
+                else:
+                    for item in added:
+                        insort(kept, item)
+                buckets[bucket] = kept
+            # Readers keep using the old state until this single assignment.
+            self._state = (buckets, new_entries)
+            self.version = taxonomy.version
+
+    def search(self, query, limit=10, kind=None):
+        """
+        Best `limit` suggestions: better ranks first, then shorter names.
+        Ranks are scanned best first and the scan stops once a rank has
+        filled the result, so worse matches are never looked at then.
+        """
+        self.refresh()
+        folded = fold(query)
+        if not folded:
+            return []
+        buckets, entries = self._state
+        kinds = [kind] if kind else sorted({bucket_kind for bucket_kind, _ in buckets})
+        # The phonetic key is only looked up among phonetic keys, else "phy"
+        # ("fi") would count as a name match for "Finance".
+        prefixes = {
+            RANK_NAME: folded, RANK_WORD: folded, RANK_CODE: folded, RANK_PHONETIC: phonetic(folded),
+        }
+        best = {}
+        for rank, prefix in prefixes.items():
+            for bucket in [(bucket_kind, rank) for bucket_kind in kinds]:
+                index = buckets.get(bucket, ())
+                position = bisect_left(index, (prefix,))
+                while position < len(index) and index[position][0].startswith(prefix):
+                    best.setdefault(index[position][1], rank)
+                    position += 1
+            if len(best) >= limit:
+                break
+        ranked = heapq.nsmallest(
+            limit,
+            best.items(),
+            key=lambda item: (item[1], len(entries[item[0]].name), entries[item[0]].name),
+        )
+        return [entries[entry_key] for entry_key, _ in ranked]
+
+
+prefix_index = PrefixIndex()
+
+
+def autocomplete(query, limit=10, kind=None):
+    return prefix_index.search(query, limit=limit, kind=kind)
@@ -0,0 +1,91 @@
+import random
+import time
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Availability, Booking, CustomUser, TeacherProfile
+
+# Availability.day_of_week codes indexed by date.weekday().
+WEEKDAY_CODES = [code for code, _ in Availability.DAY_CHOICES]
+
+# SQLite reports a concurrent writer as "database is locked" once its busy
+# timeout runs out, and as "table is locked" right away for shared-cache
+# connections. Such attempts are retried with jittered backoff for up to
+# LOCK_RETRY_TIMEOUT seconds.
+LOCK_RETRY_TIMEOUT = 10.0
+LOCK_RETRY_DELAY = 0.005
+LOCK_RETRY_MAX_DELAY = 0.1
+
+
+class BookingError(Exception):
+    """The booking request itself is invalid."""
+
+
+class SlotUnavailable(BookingError):
+    """The requested slot is outside the tutor's availability or already taken."""
+
+
+def _overlapping(queryset, date, start_time, end_time):
+    # Two intervals overlap when each starts before the other ends.
+    return queryset.filter(
+        date=date, status=Booking.CONFIRMED, start_time__lt=end_time, end_time__gt=start_time,
+    )
+
+
+def _reserve(tutor_id, student, date, start_time, end_time):
+    with transaction.atomic():
+        # Bumping the version row first makes every booker of this tutor
+        # queue on the same row lock (the write lock on SQLite) before any
+        # overlap check is read, so two checks can never both pass.
+        if not TeacherProfile.objects.filter(pk=tutor_id).update(booking_version=F('booking_version') + 1):
+            raise BookingError("Tutor not found.")
+        # Same for the student, whose overlap check must not race with
+        # their booking of another tutor. Always taken after the tutor row,
+        # so lock order is the same in every booking.
+        list(CustomUser.objects.select_for_update().filter(pk=student.pk).values_list('pk', flat=True))
+        covered = Availability.objects.filter(
+            tutor_id=tutor_id,
+            day_of_week=WEEKDAY_CODES[date.weekday()],
+            start_time__lte=start_time,
+            end_time__gte=end_time,
+        ).exists()
+        if not covered:
+            raise SlotUnavailable("The tutor is not available at this time.")
+        if _overlapping(Booking.objects.filter(tutor_id=tutor_id), date, start_time, end_time).exists():
+            raise SlotUnavailable("This slot is already booked.")
+        if _overlapping(Booking.objects.filter(student=student), date, start_time, end_time).exists():
+            raise SlotUnavailable("You already have a booking at this time.")
+        return Booking.objects.create(
+            tutor_id=tutor_id, student=student, date=date, start_time=start_time, end_time=end_time,
+        )
+
+
+def book_slot(tutor_id, student, date, start_time, end_time):
+    """
+    Books `start_time`-`end_time` on `date` with the tutor for `student`.
+    The slot must lie inside one of the tutor's availability slots for that
+    weekday and overlap no confirmed booking of the tutor or the student.
+    Raises BookingError / SlotUnavailable otherwise.
+    """
+    if start_time >= end_time:
+        raise BookingError("End time must be after start time.")
+    if date < timezone.localdate():
+        raise BookingError("Cannot book a date in the past.")
+    deadline = time.monotonic() + LOCK_RETRY_TIMEOUT
+    delay = LOCK_RETRY_DELAY
+    while True:
+        try:
+            return _reserve(tutor_id, student, date, start_time, end_time)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or time.monotonic() >= deadline:
+                raise
+            time.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, LOCK_RETRY_MAX_DELAY)
+
+
+def cancel_booking(booking):
+    """Cancels a confirmed booking, freeing its slot. Returns False if it was not confirmed."""
+    updated = Booking.objects.filter(pk=booking.pk, status=Booking.CONFIRMED).update(status=Booking.CANCELLED)
+    booking.status = Booking.CANCELLED
+    return bool(updated)
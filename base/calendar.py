@@ -0,0 +1,191 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .booking import WEEKDAY_CODES
+from .models import Availability, Booking, CalendarSlot
+
+# Days ahead (from today) for which weekly availability is materialized.
+DEFAULT_HORIZON_DAYS = 56
+
+BULK_BATCH_SIZE = 1000
+
+FreeSlot = namedtuple('FreeSlot', ['date', 'start_time', 'end_time'])
+
+
+def get_horizon_days():
+    return getattr(settings, 'CALENDAR_HORIZON_DAYS', DEFAULT_HORIZON_DAYS)
+
+
+def horizon(today=None):
+    """The materialized date range as (first day, last day), both inclusive."""
+    today = today or timezone.localdate()
+    return today, today + timedelta(days=get_horizon_days() - 1)
+
+
+def occurrences(day_of_week, first, last):
+    """Dates from `first` to `last` (inclusive) falling on `day_of_week`."""
+    day = first + timedelta(days=(WEEKDAY_CODES.index(day_of_week) - first.weekday()) % 7)
+    while day <= last:
+        yield day
+        day += timedelta(days=7)
+
+
+def _expand(availability, first, last):
+    return [
+        CalendarSlot(
+            tutor_id=availability.tutor_id, availability_id=availability.pk, date=day,
+            start_time=availability.start_time, end_time=availability.end_time,
+        )
+        for day in occurrences(availability.day_of_week, first, last)
+    ]
+
+
+def regenerate(availability, today=None):
+    """Re-expands one availability slot over the horizon; called when it is saved."""
+    first, last = horizon(today)
+    CalendarSlot.objects.filter(availability_id=availability.pk, date__gte=first).delete()
+    CalendarSlot.objects.bulk_create(_expand(availability, first, last))
+
+
+def extend(today=None, rebuild=False):
+    """
+    Moves the horizon forward: drops slots before today and expands each
+    availability slot from the day after its last materialized date. With
+    `rebuild`, every future slot is regenerated instead. Returns
+    (created, deleted).
+    """
+    first, last = horizon(today)
+    if rebuild:
+        deleted, _ = CalendarSlot.objects.all().delete()
+        materialized = {}
+    else:
+        deleted, _ = CalendarSlot.objects.filter(date__lt=first).delete()
+        materialized = dict(
+            CalendarSlot.objects.order_by().values('availability_id')
+            .annotate(last=Max('date')).values_list('availability_id', 'last')
+        )
+    created = 0
+    batch = []
+    availabilities = Availability.objects.order_by('pk').only(
+        'pk', 'tutor_id', 'day_of_week', 'start_time', 'end_time'
+    )
+    for availability in availabilities.iterator(chunk_size=BULK_BATCH_SIZE):
+        start = first
+        if availability.pk in materialized:
+            start = max(first, materialized[availability.pk] + timedelta(days=1))
+        batch.extend(_expand(availability, start, last))
+        if len(batch) >= BULK_BATCH_SIZE:
+            created += len(CalendarSlot.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(CalendarSlot.objects.bulk_create(batch))
+    return created, deleted
+
+
+def _subtract(start, end, busy):
+    """Parts of start-end not covered by the sorted (start, end) intervals in `busy`."""
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_end <= cursor or busy_start >= end:
+            continue
+        if busy_start > cursor:
+            yield cursor, busy_start
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        yield cursor, end
+
+
+def free_slots(tutor_id, first, last):
+    """
+    Yields the tutor's FreeSlots from `first` to `last` (inclusive): the
+    materialized availability minus confirmed bookings, in date order.
+    """
+    for _, slot in _free_slots_by_calendar_slot(tutor_id, first, last):
+        yield slot
+
+
+def _free_slots_by_calendar_slot(tutor_id, first, last):
+    """free_slots() as (CalendarSlot id, FreeSlot) pairs."""
+    booked = {}
+    bookings = Booking.objects.filter(
+        tutor_id=tutor_id, status=Booking.CONFIRMED, date__range=(first, last)
+    ).order_by('date', 'start_time').values_list('date', 'start_time', 'end_time')
+    for day, start, end in bookings:
+        booked.setdefault(day, []).append((start, end))
+    slots = CalendarSlot.objects.filter(
+        tutor_id=tutor_id, date__range=(first, last)
+    ).order_by('date', 'start_time').values_list('date', 'start_time', 'end_time', 'pk')
+    for day, start, end, slot_id in slots.iterator(chunk_size=BULK_BATCH_SIZE):
+        for free_start, free_end in _subtract(start, end, booked.get(day, ())):
+            yield slot_id, FreeSlot(day, free_start, free_end)
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Folds a content line to 75 octets as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _event(uid, stamp, day, start, end, summary, transparent):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        # Floating times: availability is entered in the tutor's local time.
+        f'DTSTART:{datetime.combine(day, start):%Y%m%dT%H%M%S}',
+        f'DTEND:{datetime.combine(day, end):%Y%m%dT%H%M%S}',
+        f'SUMMARY:{_escape(summary)}',
+        f'TRANSP:{"TRANSPARENT" if transparent else "OPAQUE"}',
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+def ical_export(tutor, include_bookings=False, today=None):
+    """
+    Yields the tutor's calendar over the horizon as iCalendar text, one
+    event at a time: free slots, plus confirmed bookings when
+    `include_bookings` is set.
+    """
+    first, last = horizon(today)
+    stamp = f'{datetime.now(dt_timezone.utc):%Y%m%dT%H%M%SZ}'
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Tutoria//Tutor calendar//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(tutor.user.get_full_name() or tutor.user.username)}',
+    ])
+    for slot_id, slot in _free_slots_by_calendar_slot(tutor.pk, first, last):
+        # Two availability rows can cover the same time; the CalendarSlot id
+        # keeps their events apart.
+        uid = f'free-{tutor.pk}-{slot_id}-{slot.date:%Y%m%d}-{slot.start_time:%H%M}@tutoria'
+        yield _event(uid, stamp, slot.date, slot.start_time, slot.end_time, 'Available', transparent=True)
+    if include_bookings:
+        bookings = Booking.objects.filter(
+            tutor=tutor, status=Booking.CONFIRMED, date__range=(first, last)
+        ).select_related('student').order_by('date', 'start_time')
+        for booking in bookings.iterator(chunk_size=BULK_BATCH_SIZE):
+            student = booking.student.get_full_name() or booking.student.username
+            yield _event(f'booking-{booking.pk}@tutoria', stamp, booking.date, booking.start_time,
+                         booking.end_time, f'Lesson with {student}', transparent=False)
+    yield 'END:VCALENDAR\r\n'
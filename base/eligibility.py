@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import TeacherProfile
+from .supply import parse_location
+
+# Profile items counted by TeacherProfile.completeness_score, each worth the
+# same share. A tutor is searchable when verified, not banned and every
+# item in REQUIRED is present.
+PROFILE_ITEMS = ['location', 'subjects', 'availability', 'academic_profile', 'teaching_modes', 'media', 'bio']
+REQUIRED = frozenset(['location', 'subjects', 'availability', 'academic_profile'])
+
+BULK_BATCH_SIZE = 500
+
+
+def evaluate(verified, banned, present):
+    """(is_searchable, completeness_score) for a tutor with the `present` PROFILE_ITEMS."""
+    score = round(100 * len(present.intersection(PROFILE_ITEMS)) / len(PROFILE_ITEMS))
+    return verified and not banned and REQUIRED <= present, score
+
+
+def _related(model, name):
+    """EXISTS subquery for rows of the TeacherProfile relation `name`."""
+    field = model._meta.get_field(name)
+    if field.many_to_many:
+        related, column = field.remote_field.through, 'teacherprofile_id'
+    else:
+        related, column = field.related_model, field.field.attname
+    return Exists(related.objects.filter(**{column: OuterRef('pk')}))
+
+
+def stale(queryset):
+    """
+    {(is_searchable, completeness_score): [tutor ids]} for the tutors of
+    `queryset` whose stored flags differ from their current profile. One
+    query: the related tables are probed with EXISTS subqueries.
+    """
+    model = queryset.model
+    rows = queryset.annotate(
+        has_subjects=_related(model, 'subject_list'),
+        has_teaching_modes=_related(model, 'teaching_mode'),
+        has_media=_related(model, 'medium'),
+        has_availability=_related(model, 'availabilities'),
+        has_academic_profile=_related(model, 'academic_profile'),
+    ).order_by().values_list(
+        'pk', 'verified', 'user__banned', 'user__location', 'bio',
+        'has_subjects', 'has_teaching_modes', 'has_media', 'has_availability', 'has_academic_profile',
+        'is_searchable', 'completeness_score',
+    )
+    changes = {}
+    for (tutor_id, verified, banned, location, bio, subjects, modes, media, availability, academic,
+         searchable, score) in rows:
+        present = {
+            item for item, value in [
+                ('location', parse_location(location) is not None),
+                ('subjects', subjects),
+                ('availability', availability),
+                ('academic_profile', academic),
+                ('teaching_modes', modes),
+                ('media', media),
+                ('bio', bool((bio or '').strip())),
+            ] if value
+        }
+        flags = evaluate(verified, banned, present)
+        if flags != (searchable, score):
+            changes.setdefault(flags, []).append(tutor_id)
+    return changes
+
+
+def _write(changes):
+    # One UPDATE per distinct (flag, score) pair; update() leaves
+    # updated_at alone, the flags are derived data, not a profile change.
+    for (searchable, score), tutor_ids in changes.items():
+        TeacherProfile.objects.filter(pk__in=tutor_ids).update(is_searchable=searchable, completeness_score=score)
+    return sum(len(tutor_ids) for tutor_ids in changes.values())
+
+
+def refresh(tutor_ids):
+    """
+    Recomputes the eligibility flags of the given tutors and writes those
+    that changed. Returns the number of tutors updated. Call this after
+    bulk updates that bypass model signals.
+    """
+    tutor_ids = sorted(set(tutor_ids))
+    updated = 0
+    for start in range(0, len(tutor_ids), BULK_BATCH_SIZE):
+        batch = tutor_ids[start:start + BULK_BATCH_SIZE]
+        updated += _write(stale(TeacherProfile.objects.filter(pk__in=batch)))
+    return updated
+
+
+def schedule_refresh(tutor_ids):
+    """Refreshes the tutors once the current transaction commits."""
+    tutor_ids = list(tutor_ids)
+    if tutor_ids:
+        transaction.on_commit(lambda: refresh(tutor_ids))
+
+
+def check(fix=False):
+    """
+    Compares the stored flags of every tutor with their current profile, in
+    batches of primary keys. Returns the ids of the tutors that were out of
+    date; with `fix`, their flags are rewritten.
+    """
+    drifted = []
+    last_pk = 0
+    while True:
+        batch = list(
+            TeacherProfile.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:BULK_BATCH_SIZE]
+        )
+        if not batch:
+            return drifted
+        last_pk = batch[-1]
+        changes = stale(TeacherProfile.objects.filter(pk__in=batch))
+        if fix:
+            with transaction.atomic():
+                _write(changes)
+        drifted.extend(tutor_id for tutor_ids in changes.values() for tutor_id in tutor_ids)
@@ -0,0 +1,73 @@
+import json
+import zlib
+
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Availability, TeacherProfile
+from .serializer import TeacherProfileSerializer
+
+# Profiles fetched (and held in memory) at a time.
+EXPORT_CHUNK_SIZE = 500
+
+
+# Everything TeacherProfileSerializer renders besides the profile row.
+TUTOR_PREFETCH = [
+    'subject_list', 'medium', 'teaching_mode',
+    # The model ordering joins through the tutor's user; not needed per tutor.
+    Prefetch('availabilities', queryset=Availability.objects.order_by('day_of_week', 'start_time')),
+]
+
+
+def tutor_queryset():
+    """Teacher profiles with everything TeacherProfileSerializer renders prefetched."""
+    return TeacherProfile.objects.order_by('pk').prefetch_related(*TUTOR_PREFETCH)
+
+
+def iter_tutors(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields every teacher profile serialized as one NDJSON line (bytes).
+    Pages by primary key, so memory stays bounded by `chunk_size` and no
+    database cursor is held open between chunks.
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    last_pk = 0
+    while True:
+        chunk = list(tutor_queryset().filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        yield ''.join(
+            encoder.encode(data) + '\n' for data in TeacherProfileSerializer(chunk, many=True).data
+        ).encode()
+        last_pk = chunk[-1].pk
+
+
+def gzip_stream(chunks, level=6):
+    """Compresses an iterable of bytes into one gzip stream, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or matched by
+    "*") with a non-zero q-value, so "gzip;q=0" refuses it.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0))) > 0
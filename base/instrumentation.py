@@ -0,0 +1,109 @@
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import django
+import rest_framework
+from django.conf import settings
+from django.db import connections
+
+QUERY_INSTRUMENTATION_DEFAULTS = {
+    # Requests slower than this (in milliseconds) are candidates for logging.
+    'SLOW_REQUEST_MS': 500,
+    # Requests issuing at least this many queries are candidates for logging.
+    'SLOW_QUERY_COUNT': 50,
+    # Fraction of slow requests that actually get logged (0.0 - 1.0).
+    'SAMPLE_RATE': 0.1,
+    # Emit X-DB-* response headers. None means "only when DEBUG is on".
+    'HEADERS': None,
+}
+
+# Frames from these locations are never reported as the origin of a query.
+_IGNORED_PATHS = tuple(
+    str(Path(module.__file__).resolve().parent) for module in (django, rest_framework)
+)
+_PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+
+
+def get_config():
+    """
+    Returns the QUERY_INSTRUMENTATION settings merged over the defaults.
+    """
+    config = dict(QUERY_INSTRUMENTATION_DEFAULTS)
+    config.update(getattr(settings, 'QUERY_INSTRUMENTATION', {}))
+    if config['HEADERS'] is None:
+        config['HEADERS'] = settings.DEBUG
+    return config
+
+
+def _query_origin():
+    """
+    Returns "path:line in function" for the innermost project frame that
+    issued the current query, skipping Django, DRF and this module.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(_PROJECT_ROOT)
+            and not filename.startswith(_IGNORED_PATHS)
+            and filename != __file__
+        ):
+            relative = filename[len(_PROJECT_ROOT):].lstrip('/\\')
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryStats:
+    """
+    Accumulates query count, total SQL time and the slowest statement.
+    Instances are installed as a database execute wrapper, see capture_queries().
+    """
+
+    def __init__(self, record=False):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        self.slowest_origin = None
+        # Full statement list, only kept when explicitly asked for (tests).
+        self.statements = [] if record else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total_time += duration
+            if duration > self.slowest_time or self.slowest_sql is None:
+                self.slowest_time = duration
+                self.slowest_sql = sql
+                self.slowest_origin = _query_origin()
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    @property
+    def total_ms(self):
+        return self.total_time * 1000
+
+    @property
+    def slowest_ms(self):
+        return self.slowest_time * 1000
+
+
+@contextmanager
+def capture_queries(using=None, record=False):
+    """
+    Context manager collecting QueryStats for every query run on the current
+    thread's connections (or only on the `using` alias) inside the block.
+    """
+    stats = QueryStats(record=record)
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
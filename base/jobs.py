@@ -0,0 +1,235 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Workers refresh locked_at of the jobs they are running this often, and
+# requeue jobs of lost workers at the same pace.
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+
+# Running jobs without a heartbeat for this long are assumed to be lost
+# (crashed worker) and are queued again, or failed once out of attempts.
+STALE_AFTER = timedelta(minutes=5)
+
+_tasks = {}
+
+
+def task(name=None):
+    """
+    Registers a function as a job task under `name` (defaults to
+    "<module>.<function name>"). Tasks must be importable from a `tasks`
+    module of an installed app so workers can find them.
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _tasks[task_name] = func
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def get_task(name):
+    if name not in _tasks:
+        autodiscover_modules('tasks')
+    return _tasks[name]
+
+
+def enqueue(task_name, *args, priority=0, idempotency_key=None, run_at=None, max_attempts=3, **kwargs):
+    """
+    Queues `task_name` (a registered name or task function) with the given
+    arguments. Jobs enqueued inside a transaction only become visible to
+    workers once it commits. Returns the Job, or the already existing one
+    when `idempotency_key` was used before.
+    """
+    task_name = getattr(task_name, 'task_name', task_name)
+    fields = {
+        'task': task_name,
+        'payload': {'args': list(args), 'kwargs': kwargs},
+        'priority': priority,
+        'max_attempts': max_attempts,
+        'run_at': run_at or timezone.now(),
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **fields)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 2, 4, 8 ... seconds, capped at one hour."""
+    return timedelta(seconds=min(2 ** attempts, 3600))
+
+
+def claim(worker_id, limit=10):
+    """
+    Atomically marks up to `limit` due jobs as running for `worker_id` and
+    returns them, highest priority first. A single conditional UPDATE does
+    the claim, so concurrent workers never get the same job on any database.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+    Job.objects.filter(pk__in=candidates, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return list(
+        Job.objects.filter(pk__in=candidates, status=Job.RUNNING, locked_by=worker_id, locked_at=now)
+        .order_by('-priority', 'run_at', 'pk')
+    )
+
+
+def execute(job):
+    """
+    Runs a claimed job and records the outcome, scheduling a retry with
+    backoff while attempts remain.
+    """
+    try:
+        func = get_task(job.task)
+        func(*job.payload.get('args', []), **job.payload.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %d", job.pk, job.task, job.attempts, exc_info=True)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, run_at=timezone.now() + retry_delay(job.attempts),
+                locked_by='', locked_at=None, last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, finished_at=timezone.now(), locked_by='', last_error=error,
+            )
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now(), locked_by='')
+    return True
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """
+    Puts jobs left running by a dead worker back in the queue. The lost run
+    counts as an attempt (claim() already added it); jobs out of attempts
+    are failed instead, so a job that crashes its worker is not retried
+    forever. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - stale_after)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_by='', locked_at=None,
+        last_error="Worker lost while running the job.",
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, locked_by='', locked_at=None, last_error="Worker lost while running the job.",
+    )
+    return requeued, failed
+
+
+class Worker:
+    """
+    Executes queued jobs with a pool of `concurrency` threads, each with its
+    own database connection. In burst mode the worker exits as soon as the
+    queue has no due jobs left.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, burst=False, batch_size=10):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._processed_lock = threading.Lock()
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def run_pending(self, worker_id=None):
+        """Runs due jobs on the calling thread until none are left."""
+        worker_id = worker_id or self.name
+        processed = 0
+        while not self.stopping.is_set():
+            jobs = claim(worker_id, self.batch_size)
+            if not jobs:
+                break
+            for job in jobs:
+                execute(job)
+                processed += 1
+        with self._processed_lock:
+            self.processed += processed
+        return processed
+
+    def heartbeat(self):
+        """Refreshes locked_at of the jobs this worker is running; returns their number."""
+        return Job.objects.filter(
+            Q(locked_by=self.name) | Q(locked_by__startswith=f"{self.name}:"), status=Job.RUNNING,
+        ).update(locked_at=timezone.now())
+
+    def _heartbeat_loop(self):
+        try:
+            while not self.stopping.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                close_old_connections()
+                try:
+                    self.heartbeat()
+                    requeue_stale()
+                except DatabaseError:
+                    # Retried on the next beat; STALE_AFTER leaves room for a few misses.
+                    logger.warning("Job heartbeat failed", exc_info=True)
+        finally:
+            connections.close_all()
+
+    def _loop(self, index):
+        worker_id = f"{self.name}:{index}"
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                if not self.run_pending(worker_id) and self.burst:
+                    break
+                self.stopping.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+    def run(self):
+        requeue_stale()
+        threads = [
+            threading.Thread(target=self._loop, args=(index,), name=f"job-worker-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        # Burst workers end on their own; the heartbeat has to be told.
+        self.stop()
+        heartbeat.join()
+        return self.processed
+
+    def stop(self):
+        self.stopping.set()
+
+
+@task(name='base.noop')
+def noop(*args, **kwargs):
+    """Does nothing; used by bench_jobs and for checking workers are alive."""
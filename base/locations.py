@@ -0,0 +1,157 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from . import eligibility
+from .models import CustomUser, TeacherProfile
+from .supply import parse_location, refresh_tutors
+from .utils import calculate_distance
+
+logger = logging.getLogger(__name__)
+
+# The buffer, and with it the "last known location" ingest() compares a
+# fix against, is per process. A worker that holds no pending value for a
+# user compares against the database, which lags the worker that buffered
+# the user's last move by up to FLUSH_INTERVAL. Within that window two
+# workers can disagree on whether a fix is jitter or needs confirmation;
+# keep FLUSH_INTERVAL short, or route a user's fixes to one worker, if
+# that matters.
+LOCATION_INGEST_DEFAULTS = {
+    # Moves shorter than this are GPS jitter and never reach the database.
+    'MIN_DISTANCE_KM': 0.2,
+    # Seconds a buffered location may wait before it is written.
+    'FLUSH_INTERVAL': 2.0,
+    # A buffer this large is written right away by the submitting request.
+    'MAX_PENDING': 5000,
+    # Flush from a daemon thread; when False, only submit() and flush()
+    # write (used by tests and one-off scripts).
+    'BACKGROUND': True,
+}
+
+BULK_BATCH_SIZE = 500
+
+
+def get_config():
+    config = dict(LOCATION_INGEST_DEFAULTS)
+    config.update(getattr(settings, 'LOCATION_INGEST', {}))
+    return config
+
+
+def locations_changed(user_ids):
+    """
+    Updates the data derived from user locations. Location writes use
+    update()/bulk_update(), which bypass model signals, so every writer
+    calls this afterwards.
+    """
+    tutor_ids = list(TeacherProfile.objects.filter(user_id__in=user_ids).values_list('pk', flat=True))
+    refresh_tutors(tutor_ids)
+    eligibility.refresh(tutor_ids)
+
+
+class LocationBuffer:
+    """
+    Per-process buffer of the latest location of each user. Bursts of fixes
+    from one user collapse into a single pending value, and pending values
+    are written together with bulk_update() (one UPDATE per batch touching
+    only the location column). Other processes do not see pending values,
+    see LOCATION_INGEST_DEFAULTS.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.written = 0
+
+    def latest(self, user_id):
+        """The buffered location of a user, if one is waiting to be written."""
+        return self._pending.get(user_id)
+
+    def submit(self, user_id, location):
+        config = get_config()
+        with self._lock:
+            self._pending[user_id] = location
+            backlog = len(self._pending)
+        if backlog >= config['MAX_PENDING']:
+            self.flush()
+        elif config['BACKGROUND']:
+            self._ensure_thread()
+
+    def flush(self):
+        """Writes every pending location; returns the number of users updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            users = [CustomUser(pk=user_id, location=location) for user_id, location in pending.items()]
+            try:
+                CustomUser.objects.bulk_update(users, ['location'], batch_size=BULK_BATCH_SIZE)
+                locations_changed(list(pending))
+            except DatabaseError:
+                logger.warning("Could not write %d buffered locations", len(pending), exc_info=True)
+                with self._lock:
+                    # Keep values submitted meanwhile, they are newer.
+                    self._pending = {**pending, **self._pending}
+                return 0
+            self.written += len(pending)
+            return len(pending)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='location-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(get_config()['FLUSH_INTERVAL'])
+            try:
+                self.flush()
+            finally:
+                # Do not keep a connection open between flushes.
+                connection.close()
+
+
+location_buffer = LocationBuffer()
+atexit.register(location_buffer.flush)
+
+
+def ingest(user, location, confirmed=False):
+    """
+    Handles one location fix of `user`. Returns (outcome, distance_km) where
+    outcome is:
+
+    - "invalid": not a "lat,lon,accuracy" string
+    - "unchanged": within MIN_DISTANCE_KM of the last known location
+    - "confirm": a larger move the client has not confirmed yet
+    - "updated": buffered (or, for a user's first location, written)
+
+    The last known location is this process's pending value, else the
+    stored one (`user` is loaded per request), which can trail a move
+    buffered by another worker by up to FLUSH_INTERVAL.
+    """
+    if parse_location(location) is None:
+        return 'invalid', None
+    previous = location_buffer.latest(user.pk) or user.location
+    if not previous or parse_location(previous) is None:
+        # First location: written through so it is visible at once.
+        CustomUser.objects.filter(pk=user.pk).update(location=location)
+        locations_changed([user.pk])
+        user.location = location
+        return 'updated', None
+    distance = calculate_distance(previous, location)
+    if distance < get_config()['MIN_DISTANCE_KM']:
+        return 'unchanged', distance
+    if not confirmed:
+        return 'confirm', distance
+    location_buffer.submit(user.pk, location)
+    return 'updated', distance
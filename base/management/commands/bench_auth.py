@@ -0,0 +1,99 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from base.authentication import claims_cache, get_config, refresh_flight
+from base.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures JWT authentication with and without the claims cache on an "
+        "authenticated endpoint, and how many refreshes a burst of concurrent "
+        "refresh calls with one refresh token computes. The benchmark user is "
+        "deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--refreshers', type=int, default=32, help="Concurrent refreshes of one token.")
+
+    def _requests_per_second(self, client, url, headers, count):
+        if client.get(url, headers=headers).status_code != 200:
+            raise CommandError(f"GET {url} did not authenticate.")
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get(url, headers=headers)
+        return count / (time.perf_counter() - start)
+
+    def _refresh_storm(self, refresh, threads):
+        url = reverse('token_refresh')
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def refresh_once():
+            try:
+                client = Client()
+                barrier.wait()
+                statuses.append(client.post(url, {'refresh': refresh}, content_type='application/json').status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=refresh_once) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        # The test client talks to the app in-process as "testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self._run(options)
+
+    def _run(self, options):
+        user = CustomUser.objects.create_user(username=f"bench-auth-{time.time_ns()}", email="bench-auth@example.com")
+        try:
+            refresh = RefreshToken.for_user(user)
+            headers = {'Authorization': f"Bearer {refresh.access_token}"}
+            client, url, count = Client(), reverse('base:protected_view'), options['requests']
+
+            with override_settings(JWT_CACHE={**get_config(), 'CLAIMS_MAX_ENTRIES': 0}):
+                claims_cache.clear()
+                uncached = self._requests_per_second(client, url, headers, count)
+            claims_cache.clear()
+            cached = self._requests_per_second(client, url, headers, count)
+            self.stdout.write(
+                f"GET {url}: {uncached:.0f} req/s without claims cache, {cached:.0f} req/s with it "
+                f"({(cached / uncached - 1) * 100:+.0f}%)"
+            )
+
+            refresh_flight.clear()
+            computed = []
+            original = refresh_flight.do
+
+            def counting_do(key, func):
+                def counted():
+                    computed.append(1)
+                    return func()
+                return original(key, counted)
+
+            refresh_flight.do = counting_do
+            try:
+                statuses, seconds = self._refresh_storm(str(refresh), options['refreshers'])
+            finally:
+                del refresh_flight.do
+            self.stdout.write(
+                f"{len(statuses)} concurrent refreshes of one token: {len(computed)} computed, "
+                f"{statuses.count(200)} answered 200 in {seconds * 1000:.0f} ms"
+            )
+        finally:
+            user.delete()
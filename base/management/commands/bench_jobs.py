@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base.jobs import Worker, enqueue, noop
+from base.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures job queue throughput: enqueues --jobs no-op jobs, drains them "
+        "with a burst worker and reports jobs per second. The benchmark jobs "
+        "are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        count, started_at = options['jobs'], timezone.now()
+        try:
+            start = time.perf_counter()
+            for index in range(count):
+                enqueue(noop, index, priority=index % 3)
+            enqueue_seconds = time.perf_counter() - start
+
+            worker = Worker(concurrency=options['concurrency'], poll_interval=0.05, burst=True)
+            start = time.perf_counter()
+            processed = worker.run()
+            run_seconds = time.perf_counter() - start
+        finally:
+            Job.objects.filter(task=noop.task_name, created_at__gte=started_at).delete()
+
+        self.stdout.write(f"enqueue: {count / enqueue_seconds:10.0f} jobs/s ({count} jobs in {enqueue_seconds:.2f} s)")
+        self.stdout.write(
+            f"process: {processed / run_seconds:10.0f} jobs/s ({processed} jobs in {run_seconds:.2f} s, "
+            f"{options['concurrency']} threads)"
+        )
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from base.locations import get_config, ingest, location_buffer
+from base.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures set_location ingestion: feeds --updates GPS fixes for --users "
+        "users (a mix of jitter and real moves) through the coalescing buffer, "
+        "and compares with one full user.save() per move. Benchmark users are "
+        "deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--updates', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = f"bench-location-{rng.randrange(10 ** 6)}-"
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f"{prefix}{index}", email=f"{prefix}{index}@example.com",
+                       location=f"{23.7 + rng.random() * 0.2:.6f},{90.3 + rng.random() * 0.2:.6f},10")
+            for index in range(options['users'])
+        )
+        positions = {user.pk: tuple(map(float, user.location.split(',')[:2])) for user in users}
+
+        def fix(user):
+            lat, lon = positions[user.pk]
+            # One fix in four is a real move (~500 m), the rest is jitter.
+            step = 0.005 if rng.random() < 0.25 else 0.0002
+            lat, lon = lat + rng.uniform(-step, step), lon + rng.uniform(-step, step)
+            positions[user.pk] = (lat, lon)
+            return f"{lat:.6f},{lon:.6f},10"
+
+        fixes = [(user, fix(user)) for user in (rng.choice(users) for _ in range(options['updates']))]
+        try:
+            config = {**get_config(), 'BACKGROUND': False, 'MAX_PENDING': 10 ** 9}
+            with override_settings(LOCATION_INGEST=config):
+                buffer_written = location_buffer.written
+                outcomes = {}
+                start = time.perf_counter()
+                for user, location in fixes:
+                    outcome, _ = ingest(user, location, confirmed=True)
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                ingest_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                location_buffer.flush()
+                flush_seconds = time.perf_counter() - start
+                written = location_buffer.written - buffer_written
+
+            total = ingest_seconds + flush_seconds
+            self.stdout.write(
+                f"Coalesced: {len(fixes)} fixes in {total:.2f}s ({len(fixes) / total:.0f}/s); "
+                f"{outcomes.get('unchanged', 0)} jitter dropped, {outcomes.get('updated', 0)} accepted, "
+                f"{written} rows written in one flush of {flush_seconds * 1000:.0f} ms"
+            )
+
+            sample = [(user, location) for user, location in fixes][:min(2000, len(fixes))]
+            start = time.perf_counter()
+            for user, location in sample:
+                user.location = location
+                user.save()
+            naive_seconds = time.perf_counter() - start
+            self.stdout.write(
+                f"Full save() per fix: {len(sample)} fixes in {naive_seconds:.2f}s ({len(sample) / naive_seconds:.0f}/s)"
+            )
+        finally:
+            CustomUser.objects.filter(username__startswith=prefix).delete()
@@ -0,0 +1,44 @@
+import gzip
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from base.export import tutor_queryset
+from base.renderers import MessagePackRenderer, msgpack
+from base.serializer import TeacherProfileSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the JSON and MessagePack renderers on serialized teacher "
+        "profiles (with availability): payload size, gzipped size and time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tutors', type=int, default=500, help="Number of profiles per payload.")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if msgpack is None:
+            raise CommandError("msgpack is not installed.")
+        tutors = list(tutor_queryset()[:options['tutors']])
+        if not tutors:
+            raise CommandError("No teacher profiles to serialize.")
+        self.stdout.write(f"{len(tutors)} profiles, best of {options['repeat']} runs")
+        for renderer in (JSONRenderer(), MessagePackRenderer()):
+            # Serializer fields look at the accepted renderer (compact times).
+            context = {'request': SimpleNamespace(accepted_renderer=renderer)}
+            serialize_times, render_times = [], []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                data = TeacherProfileSerializer(tutors, many=True, context=context).data
+                serialized = time.perf_counter()
+                payload = renderer.render(data)
+                serialize_times.append(serialized - start)
+                render_times.append(time.perf_counter() - serialized)
+            self.stdout.write(
+                f"{renderer.format:8} {len(payload):>10} bytes {len(gzip.compress(payload)):>9} gzipped "
+                f"serialize {min(serialize_times) * 1000:7.2f} ms render {min(render_times) * 1000:7.2f} ms"
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from base.eligibility import check
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares every tutor's is_searchable and completeness_score with their "
+        "current profile. Meant to run nightly; --fix rewrites the stale flags."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rewrite the flags that are out of date.")
+
+    def handle(self, *args, **options):
+        drifted = check(fix=options['fix'])
+        if not drifted:
+            self.stdout.write("All eligibility flags are up to date.")
+            return
+        action = "Fixed" if options['fix'] else "Found"
+        self.stdout.write(f"{action} {len(drifted)} tutors with stale eligibility flags.")
+        self.stdout.write("Tutor ids: " + ", ".join(str(pk) for pk in drifted[:50]) + (" ..." if len(drifted) > 50 else ""))
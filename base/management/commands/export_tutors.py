@@ -0,0 +1,32 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from base.export import EXPORT_CHUNK_SIZE, iter_tutors
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the tutor directory as NDJSON (one teacher profile per line) to "
+        "--output, or stdout. Output paths ending in .gz are gzip-compressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="File to write; defaults to stdout.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        if path is None:
+            for chunk in iter_tutors(options['chunk_size']):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        opener = gzip.open if path.endswith('.gz') else open
+        lines = 0
+        with opener(path, 'wb') as output:
+            for chunk in iter_tutors(options['chunk_size']):
+                output.write(chunk)
+                lines += chunk.count(b'\n')
+        self.stderr.write(f"Exported {lines} teacher profiles to {path}.")
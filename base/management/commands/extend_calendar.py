@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from base.calendar import extend, get_horizon_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the materialized calendar window forward: drops past slots and "
+        "expands weekly availability up to CALENDAR_HORIZON_DAYS ahead. Run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Regenerate every slot from scratch.")
+
+    def handle(self, *args, **options):
+        created, deleted = extend(rebuild=options['rebuild'])
+        self.stdout.write(
+            f"Created {created} and deleted {deleted} calendar slots ({get_horizon_days()} day horizon)."
+        )
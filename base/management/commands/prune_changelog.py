@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from base.sync import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes sync change log entries older than SYNC_FEED['RETENTION_DAYS']. "
+        "Clients with an older cursor are told to resync from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override the retention period.")
+
+    def handle(self, *args, **options):
+        deleted = prune(options['days'])
+        self.stdout.write(f"Deleted {deleted} change log entries.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from base.supply import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the tutor supply heatmap from scratch. Needed after changing "
+        "SUPPLY_HEATMAP zoom levels; otherwise a periodic consistency pass."
+    )
+
+    def handle(self, *args, **options):
+        cells = rebuild()
+        self.stdout.write(f"Rebuilt {cells} supply cells.")
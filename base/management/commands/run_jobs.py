@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from base.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Runs background job workers using the database as the queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Number of worker threads.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once no due jobs are left.")
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        self.stdout.write(f"Worker {worker.name} started with {worker.concurrency} threads.")
+        processed = worker.run()
+        self.stdout.write(f"Worker {worker.name} stopped after {processed} jobs.")
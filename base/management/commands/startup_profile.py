@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported or cached.
+BOOT_SCRIPT = """
+import json, os, sys, time
+os.environ["DJANGO_SETTINGS_MODULE"] = {settings_module!r}
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+end = time.perf_counter()
+sys.stdout.write(json.dumps({{"setup": setup_done - start, "imports": end - setup_done, "total": end - start}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports where worker start-up time goes: django.setup(), importing the "
+        "URLconf and the slowest modules according to `python -X importtime`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Cold starts to measure (median is reported).")
+        parser.add_argument('--top', type=int, default=15, help="Number of modules/packages to list.")
+        parser.add_argument(
+            '--module', action='append', dest='modules',
+            help="Module to import after django.setup(). Defaults to ROOT_URLCONF.",
+        )
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF]
+        script = BOOT_SCRIPT.format(
+            settings_module=os.environ.get('DJANGO_SETTINGS_MODULE', 'tutoria.settings'),
+            modules=modules,
+        )
+
+        timings, importtime = [], None
+        for _ in range(max(options['runs'], 1)):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', script],
+                capture_output=True, text=True, cwd=settings.BASE_DIR,
+            )
+            if result.returncode != 0:
+                raise CommandError(result.stderr.strip().splitlines()[-1])
+            timings.append(json.loads(result.stdout))
+            importtime = result.stderr
+
+        for phase in ('setup', 'imports', 'total'):
+            value = median(run[phase] for run in timings) * 1000
+            self.stdout.write(f"{phase:>8}: {value:8.1f} ms (median of {len(timings)})")
+
+        modules_cumulative, packages_self = parse_importtime(importtime)
+        self.stdout.write(self.style.MIGRATE_HEADING("\nSlowest modules (cumulative, last run):"))
+        for name, micros in sorted(modules_cumulative.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{micros / 1000:8.1f} ms  {name}")
+        self.stdout.write(self.style.MIGRATE_HEADING("\nTop-level packages (self time, last run):"))
+        for name, micros in sorted(packages_self.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{micros / 1000:8.1f} ms  {name}")
+
+
+def parse_importtime(output):
+    """
+    Parses `-X importtime` output into ({module: cumulative us},
+    {top-level package: summed self us}).
+    """
+    modules_cumulative = {}
+    packages_self = defaultdict(int)
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        modules_cumulative[name] = int(cumulative_us)
+        packages_self[name.split('.')[0]] += int(self_us)
+    return modules_cumulative, dict(packages_self)
@@ -0,0 +1,362 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+METRICS_DEFAULTS = {
+    # Directory shared by all worker processes. Each process periodically
+    # writes its own snapshot there and the metrics endpoint merges them.
+    # None keeps metrics in-process only.
+    'DIR': None,
+    # Seconds between snapshot writes of a single process.
+    'FLUSH_INTERVAL': 5.0,
+    # Snapshots of processes that are gone are folded into RETIRED_SNAPSHOT
+    # by the next scrape. Where process ids cannot be checked (or may have
+    # been reused), a snapshot not rewritten for this many seconds counts
+    # as gone.
+    'EXPIRE_AFTER': 86400,
+}
+
+# Totals of retired snapshots, so counters never go backwards.
+RETIRED_SNAPSHOT = 'retired.json'
+
+# Held by the scrape that is folding snapshots into RETIRED_SNAPSHOT.
+COMPACT_LOCK = 'compact.lock'
+COMPACT_LOCK_TIMEOUT = 60
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_TYPES = {
+    'tutoria_http_request_duration_seconds': ('histogram', "Request latency by view."),
+    'tutoria_http_responses_total': ('counter', "Responses by view and status code."),
+    'tutoria_db_duration_seconds': ('histogram', "Time spent in SQL per request by view."),
+    'tutoria_db_queries_total': ('counter', "Queries executed by view."),
+    'tutoria_auth_duration_seconds': ('histogram', "Time spent in authentication backends."),
+    'tutoria_jwt_claims_cache_total': ('counter', "Access token validations by claims cache result."),
+    'tutoria_token_refresh_total': ('counter', "Token refreshes, computed or shared with a concurrent one."),
+}
+
+
+def get_config():
+    config = dict(METRICS_DEFAULTS)
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class _Shard:
+    """
+    Metrics recorded by a single thread. Only the owning thread writes to it,
+    so recording needs no locking.
+    """
+
+    def __init__(self, owner=None):
+        self.owner = owner
+        self.histograms = {}
+        self.counters = {}
+
+    def merge_into(self, histograms, counters):
+        for key, values in dict(self.histograms).items():
+            merged = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                merged[index] += value
+        for key, value in dict(self.counters).items():
+            counters[key] = counters.get(key, 0) + value
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        # os.kill() terminates the process on Windows.
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, but owned by someone else.
+        return True
+    return True
+
+
+def _load(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        # Being replaced right now or truncated.
+        return None
+
+
+def _write_atomic(directory, path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(tmp_path, path)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics store with per-thread aggregation.
+
+    Histogram values are lists of per-bucket counts (the last bucket is +Inf)
+    followed by the sum and the count of all observations.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        # Totals of threads that have exited.
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._next_flush = 0.0
+        # Directory this process last wrote its snapshot to; only processes
+        # that serve requests ever flush.
+        self._flushed_to = None
+        # Unique per process lifetime so a recycled pid never overwrites the
+        # snapshot of a dead worker.
+        self.process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 3)
+        histogram[bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def inc(self, name, labels, amount=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """
+        Merges all thread shards into {"histograms": [...], "counters": [...]}
+        where every entry is [name, labels, value].
+        """
+        histograms, counters = {}, {}
+        with self._shards_lock:
+            # Fold the shards of exited threads into the retired totals; a
+            # dead thread no longer writes to its shard.
+            for shard in [shard for shard in self._shards if not shard.owner.is_alive()]:
+                shard.merge_into(self._retired.histograms, self._retired.counters)
+                self._shards.remove(shard)
+            shards = [self._retired, *self._shards]
+        for shard in shards:
+            shard.merge_into(histograms, counters)
+        return {
+            'histograms': [[name, dict(labels), values] for (name, labels), values in histograms.items()],
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        }
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in [self._retired, *self._shards]:
+                shard.histograms.clear()
+                shard.counters.clear()
+
+    def _snapshot_path(self, directory):
+        return Path(directory) / f"{self.process_id}.json"
+
+    def flush(self, force=False):
+        """
+        Writes this process's snapshot to the shared metrics directory, at
+        most once per FLUSH_INTERVAL unless `force` is given.
+        """
+        config = get_config()
+        if not config['DIR']:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_flush:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_flush = now + config['FLUSH_INTERVAL']
+            directory = Path(config['DIR'])
+            directory.mkdir(parents=True, exist_ok=True)
+            path = self._snapshot_path(directory)
+            if self._flushed_to == directory and not path.exists():
+                # A scrape took this process for dead and retired its
+                # snapshot; those numbers are counted there now.
+                self.reset()
+            _write_atomic(directory, path, self.snapshot())
+            self._flushed_to = directory
+        finally:
+            self._flush_lock.release()
+
+    def flush_at_exit(self):
+        """Final flush of processes that have been flushing to the current directory."""
+        directory = get_config()['DIR']
+        if self._flushed_to is not None and directory and Path(directory) == self._flushed_to:
+            self.flush(force=True)
+
+    def collect(self):
+        """
+        Returns the merged snapshots of every process writing to the shared
+        directory, with this process's live numbers instead of its file.
+        Snapshots of processes that are gone are compacted first.
+        """
+        snapshots = [self.snapshot()]
+        directory = get_config()['DIR']
+        if directory and Path(directory).is_dir():
+            directory = Path(directory)
+            self.compact(directory)
+            own_path = self._snapshot_path(directory)
+            for path in directory.glob('*.json'):
+                if path == own_path:
+                    continue
+                snapshot = _load(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def _is_gone(self, path, expire_after):
+        try:
+            if time.time() - path.stat().st_mtime > expire_after:
+                return True
+        except FileNotFoundError:
+            return False
+        try:
+            pid = int(path.stem.split('-')[0])
+        except ValueError:
+            return False
+        return _pid_alive(pid) is False
+
+    def compact(self, directory):
+        """
+        Folds the snapshots of dead (or long silent) processes into
+        RETIRED_SNAPSHOT and deletes them, so scrapes read one file per
+        live process. Returns the number of snapshots retired; 0 when
+        another scrape is compacting.
+        """
+        expire_after = get_config()['EXPIRE_AFTER']
+        own_path = self._snapshot_path(directory)
+        gone = [
+            path for path in directory.glob('*.json')
+            if path.name != RETIRED_SNAPSHOT and path != own_path and self._is_gone(path, expire_after)
+        ]
+        if not gone:
+            return 0
+        lock = directory / COMPACT_LOCK
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime > COMPACT_LOCK_TIMEOUT:
+                    # Left behind by a scrape that died while compacting.
+                    lock.unlink()
+            except FileNotFoundError:
+                pass
+            return 0
+        try:
+            retired_path = directory / RETIRED_SNAPSHOT
+            snapshots = [_load(retired_path) or {'histograms': [], 'counters': []}]
+            retired = []
+            for path in gone:
+                snapshot = _load(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+                    retired.append(path)
+            histograms, counters = merge_snapshots(snapshots)
+            _write_atomic(directory, retired_path, {
+                'histograms': [[name, dict(labels), values] for (name, labels), values in histograms.items()],
+                'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            })
+            for path in retired:
+                path.unlink(missing_ok=True)
+            return len(retired)
+        finally:
+            lock.unlink(missing_ok=True)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def merge_snapshots(snapshots):
+    histograms, counters = {}, {}
+    for snapshot in snapshots:
+        for name, labels, values in snapshot['histograms']:
+            merged = histograms.setdefault((name, _labels_key(labels)), [0] * len(values))
+            for index, value in enumerate(values):
+                merged[index] += value
+        for name, labels, value in snapshot['counters']:
+            key = (name, _labels_key(labels))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render_prometheus(histograms, counters):
+    """
+    Renders merged metrics in the Prometheus text exposition format (0.0.4).
+    """
+    lines = []
+    for name, (metric_type, help_text) in METRIC_TYPES.items():
+        source = histograms if metric_type == 'histogram' else counters
+        series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in series:
+            if metric_type == 'counter':
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush_at_exit)
+
+
+class TimedAuthenticationMixin:
+    """
+    Mixin for DRF authentication classes recording how long authenticate()
+    takes, labelled with the backend class name.
+    """
+
+    def authenticate(self, request):
+        start = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            registry.observe(
+                'tutoria_auth_duration_seconds',
+                (('backend', type(self).__name__),),
+                time.perf_counter() - start,
+            )
@@ -0,0 +1,82 @@
+import logging
+import random
+import time
+
+from .instrumentation import capture_queries, get_config
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the number of queries, total SQL time and the slowest statement
+    for every request.
+
+    The stats are attached to the request as `request.query_stats`, exposed as
+    X-DB-* response headers when enabled (by default only in DEBUG) and a
+    sample of slow requests is logged together with the code that issued
+    their slowest query.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with capture_queries() as stats:
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        request.query_stats = stats
+
+        if self.config['HEADERS']:
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f"{stats.total_ms:.2f}"
+            response['X-DB-Slowest-Ms'] = f"{stats.slowest_ms:.2f}"
+
+        is_slow = (
+            elapsed_ms >= self.config['SLOW_REQUEST_MS']
+            or stats.count >= self.config['SLOW_QUERY_COUNT']
+        )
+        if is_slow and random.random() < self.config['SAMPLE_RATE']:
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d queries, %.1f ms SQL; "
+                "slowest query %.1f ms from %s: %s",
+                request.method,
+                request.path,
+                elapsed_ms,
+                stats.count,
+                stats.total_ms,
+                stats.slowest_ms,
+                stats.slowest_origin or 'unknown',
+                stats.slowest_sql,
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency, status codes and DB time into the metrics
+    registry. Must sit above QueryInstrumentationMiddleware so the query
+    stats of the request are available once the response comes back.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (('view', match.view_name if match else '<unresolved>'),)
+        registry.observe('tutoria_http_request_duration_seconds', view, elapsed)
+        registry.inc('tutoria_http_responses_total', view + (('status', str(response.status_code)),))
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            registry.observe('tutoria_db_duration_seconds', view, stats.total_time)
+            registry.inc('tutoria_db_queries_total', view, stats.count)
+        registry.flush()
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:36
+
+import base.models
+import base.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_teacherprofile_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('digest', models.CharField(help_text='SHA-256 of the file content.', max_length=64, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(default='application/octet-stream', max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of file fields pointing at this blob.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='academicprofile',
+            name='certificates',
+            field=models.FileField(blank=True, null=True, storage=base.storage.get_certificate_storage, upload_to=base.models.certificate_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='qualification',
+            name='certificates',
+            field=models.FileField(blank=True, null=True, storage=base.storage.get_certificate_storage, upload_to=base.models.certificate_upload_to),
+        ),
+    ]
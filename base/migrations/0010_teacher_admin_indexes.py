@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingVerification',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Pending verification',
+                'verbose_name_plural': 'Verification queue',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('base.teacherprofile',),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='user_email_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherprofile',
+            index=models.Index(condition=models.Q(('verified', False)), fields=['id'], name='teacher_unverified_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teacherprofile',
+            name='booking_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bumped by every booking attempt; serializes concurrent bookings of this tutor.'),
+        ),
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='confirmed', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL)),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='base.teacherprofile')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(condition=models.Q(('status', 'confirmed')), fields=['tutor', 'date', 'start_time'], name='booking_tutor_slot_idx'), models.Index(condition=models.Q(('status', 'confirmed')), fields=['student', 'date', 'start_time'], name='booking_student_slot_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_booking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('availability', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_slots', to='base.availability')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_slots', to='base.teacherprofile')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['tutor', 'date', 'start_time'], name='calendar_tutor_date_idx'), models.Index(fields=['date', 'start_time'], name='calendar_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('availability', 'date'), name='calendar_slot_unique_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_calendarslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyFootprint',
+            fields=[
+                ('tutor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='supply_footprint', serialize=False, to='base.teacherprofile')),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('subjects', models.JSONField(default=list)),
+                ('teaching_modes', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SupplyCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('subject', models.PositiveIntegerField(default=0, help_text='Subject id, 0 for any subject.')),
+                ('teaching_mode', models.PositiveIntegerField(default=0, help_text='Teaching mode id, 0 for any mode.')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'subject', 'teaching_mode', 'x', 'y'), name='supply_cell_unique')],
+            },
+        ),
+    ]
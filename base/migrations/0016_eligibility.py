@@ -0,0 +1,89 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:07
+
+from django.db import migrations, models
+
+# Frozen copy of base.eligibility as of this migration; later changes to
+# that module must not change what this backfill computes.
+PROFILE_ITEMS = ['location', 'subjects', 'availability', 'academic_profile', 'teaching_modes', 'media', 'bio']
+REQUIRED = frozenset(['location', 'subjects', 'availability', 'academic_profile'])
+BATCH_SIZE = 500
+
+
+def has_location(location):
+    try:
+        lat, lon = (float(part) for part in (location or '').split(',')[:2])
+    except ValueError:
+        return False
+    return -85.0511 <= lat <= 85.0511 and -180 <= lon <= 180
+
+
+def related_exists(TeacherProfile, name):
+    field = TeacherProfile._meta.get_field(name)
+    if field.many_to_many:
+        related, column = field.remote_field.through, 'teacherprofile_id'
+    else:
+        related, column = field.related_model, field.field.attname
+    return models.Exists(related.objects.filter(**{column: models.OuterRef('pk')}))
+
+
+def compute_flags(apps, schema_editor):
+    TeacherProfile = apps.get_model('base', 'TeacherProfile')
+    tutors = TeacherProfile.objects.annotate(
+        has_subjects=related_exists(TeacherProfile, 'subject_list'),
+        has_teaching_modes=related_exists(TeacherProfile, 'teaching_mode'),
+        has_media=related_exists(TeacherProfile, 'medium'),
+        has_availability=related_exists(TeacherProfile, 'availabilities'),
+        has_academic_profile=related_exists(TeacherProfile, 'academic_profile'),
+    ).order_by('pk')
+    last_pk = 0
+    while True:
+        rows = list(tutors.filter(pk__gt=last_pk).values_list(
+            'pk', 'verified', 'user__banned', 'user__location', 'bio',
+            'has_subjects', 'has_teaching_modes', 'has_media', 'has_availability', 'has_academic_profile',
+        )[:BATCH_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        changes = {}
+        for tutor_id, verified, banned, location, bio, subjects, modes, media, availability, academic in rows:
+            present = {
+                item for item, value in [
+                    ('location', has_location(location)),
+                    ('subjects', subjects),
+                    ('availability', availability),
+                    ('academic_profile', academic),
+                    ('teaching_modes', modes),
+                    ('media', media),
+                    ('bio', bool((bio or '').strip())),
+                ] if value
+            }
+            score = round(100 * len(present) / len(PROFILE_ITEMS))
+            searchable = bool(verified and not banned and REQUIRED <= present)
+            changes.setdefault((searchable, score), []).append(tutor_id)
+        for (searchable, score), tutor_ids in changes.items():
+            TeacherProfile.objects.filter(pk__in=tutor_ids).update(is_searchable=searchable, completeness_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_supply'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teacherprofile',
+            name='completeness_score',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Percentage of the profile filled in; maintained by base.eligibility.'),
+        ),
+        migrations.AddField(
+            model_name='teacherprofile',
+            name='is_searchable',
+            field=models.BooleanField(default=False, editable=False, help_text='Verified, not banned and with a complete profile; maintained by base.eligibility.'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherprofile',
+            index=models.Index(condition=models.Q(('is_searchable', True)), fields=['-completeness_score', 'id'], name='teacher_searchable_idx'),
+        ),
+        migrations.RunPython(compute_flags, migrations.RunPython.noop),
+    ]
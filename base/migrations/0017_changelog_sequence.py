@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:31
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_entries(apps, schema_editor):
+    # Existing cursors are ids; numbering the committed entries by id keeps
+    # them valid.
+    ChangeLogEntry = apps.get_model('base', 'ChangeLogEntry')
+    CacheVersion = apps.get_model('base', 'CacheVersion')
+    ChangeLogEntry.objects.update(sequence=F('id'))
+    last = ChangeLogEntry.objects.aggregate(last=Max('id'))['last'] or 0
+    CacheVersion.objects.update_or_create(name='sync.changelog', defaults={'version': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0016_eligibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogentry',
+            name='sequence',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(number_existing_entries, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from .storage import get_certificate_storage
  
 
 class CustomUser(AbstractUser):
@@ -14,8 +17,41 @@ class CustomUser(AbstractUser):
     )
     banned = models.BooleanField(default=False, help_text="Indicates if the user is banned from the platform.")
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive exact email lookups (admin search uses iexact).
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
+
 def certificate_upload_to(instance, filename):
-    return f"certificates/{instance.user.username}/{filename}"
+    return f"certificates/{instance.teacher.user.username}/{filename}"
+
+
+class CertificateOwnerMixin:
+    """
+    Saves in one transaction with the blob reference counting done while
+    storing the certificate (and in base.signals), so a failed save takes
+    its references back with it.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class StoredBlob(models.Model):
+    """
+    A file kept once by ContentAddressedStorage, shared by every field that
+    references the same content.
+    """
+    digest = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the file content.")
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of file fields pointing at this blob.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest
 
 class Medium(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -46,27 +82,27 @@ class Subject(models.Model):
     def __str__(self):
         return self.name
 
-class AcademicProfile(models.Model):
+class AcademicProfile(CertificateOwnerMixin, models.Model):
     teacher = models.ForeignKey('TeacherProfile', on_delete=models.CASCADE, related_name='academic_profile')
     institution = models.CharField(max_length=255, blank=True)
     degree = models.CharField(max_length=100, blank=True)
     graduation_year = models.PositiveIntegerField(null=True, blank=True)
     results = models.TextField(blank=True)
-    certificates = models.FileField(upload_to=certificate_upload_to, blank=True, null=True)
+    certificates = models.FileField(upload_to=certificate_upload_to, storage=get_certificate_storage, blank=True, null=True)
 
     def __str__(self):
         return f"{self.teacher.user.username}'s Academic Profile"
     
-class Qualification(models.Model):
+class Qualification(CertificateOwnerMixin, models.Model):
     teacher = models.ForeignKey('TeacherProfile', on_delete=models.CASCADE, related_name='qualifications')
     organization = models.CharField(max_length=255, blank=True)
     skill = models.CharField(max_length=100, blank=True)
     year = models.PositiveIntegerField(null=True, blank=True)
     results = models.TextField(blank=True,null=True)
-    certificates = models.FileField(upload_to=certificate_upload_to, blank=True, null=True)
+    certificates = models.FileField(upload_to=certificate_upload_to, storage=get_certificate_storage, blank=True, null=True)
 
     def __str__(self):
-        return f"{self.user.username}'s Academic Profile"
+        return f"{self.teacher.user.username}'s Qualification"
 
 class TeacherProfile(models.Model):
     user = models.OneToOneField('CustomUser', on_delete=models.CASCADE, related_name='teacher_profile')
@@ -88,6 +124,30 @@ class TeacherProfile(models.Model):
     gender = models.CharField(max_length=20, choices=GENDER_CHOICES, blank=True)
     teaching_mode = models.ManyToManyField(TeachingMode,blank=True, related_name='teacher_profiles')
     preferred_distance = models.PositiveIntegerField(default=0, help_text="Preferred distance for teaching in kilometers")
+    updated_at = models.DateTimeField(auto_now=True)
+    booking_version = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text="Bumped by every booking attempt; serializes concurrent bookings of this tutor."
+    )
+    is_searchable = models.BooleanField(
+        default=False, editable=False,
+        help_text="Verified, not banned and with a complete profile; maintained by base.eligibility."
+    )
+    completeness_score = models.PositiveSmallIntegerField(
+        default=0, editable=False,
+        help_text="Percentage of the profile filled in; maintained by base.eligibility."
+    )
+
+    class Meta:
+        indexes = [
+            # Serves the admin verification queue without scanning verified profiles.
+            models.Index(fields=['id'], condition=models.Q(verified=False), name='teacher_unverified_idx'),
+            # Tutor search: searchable tutors only, most complete profiles first.
+            models.Index(
+                fields=['-completeness_score', 'id'], condition=models.Q(is_searchable=True),
+                name='teacher_searchable_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s Teacher Profile"
@@ -100,6 +160,16 @@ class TeacherProfile(models.Model):
             )
 
 
+class PendingVerification(TeacherProfile):
+    """
+    Teacher profiles waiting for an admin to verify them (admin queue).
+    """
+    class Meta:
+        proxy = True
+        verbose_name = "Pending verification"
+        verbose_name_plural = "Verification queue"
+
+
 class Availability(models.Model):
     """
     Represents a specific time slot a tutor is available on a given day.
@@ -128,6 +198,7 @@ class Availability(models.Model):
     )
     start_time = models.TimeField(help_text="The start time of the availability slot.")
     end_time = models.TimeField(help_text="The end time of the availability slot.")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Availability Slot"
@@ -151,3 +222,190 @@ class Availability(models.Model):
 
     def __str__(self):
         return f"{self.tutor.user.username} - {self.get_day_of_week_display()} ({self.start_time.strftime('%I:%M %p')} - {self.end_time.strftime('%I:%M %p')})"
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work, queued in the database and executed by
+    `manage.py run_jobs` workers (see base.jobs).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200, help_text="Registered task name.")
+    payload = models.JSONField(default=dict, blank=True, help_text="Positional and keyword arguments of the task.")
+    priority = models.SmallIntegerField(default=0, help_text="Jobs with a higher priority run first.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text="The job is not started before this time.")
+    idempotency_key = models.CharField(
+        max_length=200, unique=True, blank=True, null=True,
+        help_text="Enqueuing a job with a key that already exists returns the existing job."
+    )
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_dequeue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of changes to synced models. `sequence` is the cursor
+    clients pass to the sync feed to get only what changed; it is handed out
+    after the entry commits (see base.sync.assign_sequences), so it grows in
+    commit order, unlike the id.
+    """
+    TEACHER = 'teacher'
+    AVAILABILITY = 'availability'
+    KIND_CHOICES = [
+        (TEACHER, 'Teacher profile'),
+        (AVAILABILITY, 'Availability slot'),
+    ]
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    sequence = models.PositiveBigIntegerField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = "Change log entries"
+
+    def __str__(self):
+        return f"#{self.sequence or '-'} {self.operation} {self.kind} {self.object_id}"
+
+
+class CacheVersion(models.Model):
+    """
+    Version stamp of a process-local cache. Writers bump it, every worker
+    compares it with the version it has loaded and reloads when it differs.
+    The sync feed keeps its last handed out sequence number here too.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class Booking(models.Model):
+    """
+    A lesson a student booked with a tutor on a concrete date, inside one of
+    the tutor's weekly availability slots. Created through base.booking.
+    """
+    CONFIRMED = 'confirmed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (CONFIRMED, 'Confirmed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    tutor = models.ForeignKey(TeacherProfile, on_delete=models.CASCADE, related_name='bookings')
+    student = models.ForeignKey('CustomUser', on_delete=models.CASCADE, related_name='bookings')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=CONFIRMED)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        indexes = [
+            # Overlap checks look up confirmed bookings of one tutor (or
+            # student) on one date, ordered by start time.
+            models.Index(fields=['tutor', 'date', 'start_time'], condition=models.Q(status='confirmed'), name='booking_tutor_slot_idx'),
+            models.Index(fields=['student', 'date', 'start_time'], condition=models.Q(status='confirmed'), name='booking_student_slot_idx'),
+        ]
+
+    def clean(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError(_('End time must be after start time.'), code='invalid_time_range')
+
+    def __str__(self):
+        return f"Booking #{self.pk} on {self.date} ({self.start_time.strftime('%I:%M %p')} - {self.end_time.strftime('%I:%M %p')})"
+
+
+class CalendarSlot(models.Model):
+    """
+    One weekly Availability slot expanded to a concrete date. Rows are kept
+    for today up to CALENDAR_HORIZON_DAYS ahead by base.calendar, so date
+    range queries never expand recurrences at request time.
+    """
+    tutor = models.ForeignKey(TeacherProfile, on_delete=models.CASCADE, related_name='calendar_slots')
+    availability = models.ForeignKey(Availability, on_delete=models.CASCADE, related_name='calendar_slots')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['availability', 'date'], name='calendar_slot_unique_date'),
+        ]
+        indexes = [
+            models.Index(fields=['tutor', 'date', 'start_time'], name='calendar_tutor_date_idx'),
+            models.Index(fields=['date', 'start_time'], name='calendar_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} ({self.start_time.strftime('%I:%M %p')} - {self.end_time.strftime('%I:%M %p')})"
+
+
+class SupplyCell(models.Model):
+    """
+    Number of tutors located in one map tile (Web Mercator z/x/y), per
+    subject and teaching mode. Subject and teaching mode 0 stand for "any":
+    those rows count every tutor in the tile once. Maintained by base.supply.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    subject = models.PositiveIntegerField(default=0, help_text="Subject id, 0 for any subject.")
+    teaching_mode = models.PositiveIntegerField(default=0, help_text="Teaching mode id, 0 for any mode.")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves tile lookups: zoom and filters first, then the x range.
+            models.UniqueConstraint(fields=['zoom', 'subject', 'teaching_mode', 'x', 'y'], name='supply_cell_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.zoom}/{self.x}/{self.y} subject={self.subject} mode={self.teaching_mode}: {self.count}"
+
+
+class SupplyFootprint(models.Model):
+    """
+    What a tutor currently contributes to SupplyCell: the tile at the
+    deepest zoom level plus the subject and teaching mode ids. Diffing it
+    against the tutor's new state yields the cell count deltas.
+    """
+    tutor = models.OneToOneField(TeacherProfile, on_delete=models.CASCADE, primary_key=True, related_name='supply_footprint')
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    subjects = models.JSONField(default=list)
+    teaching_modes = models.JSONField(default=list)
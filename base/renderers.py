@@ -0,0 +1,77 @@
+import datetime
+import decimal
+import uuid
+
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:  # Optional; the renderer is only enabled when installed.
+    msgpack = None
+
+
+def minutes(value):
+    """A time of day as minutes after midnight, the compact wire format for slots."""
+    return value.hour * 60 + value.minute
+
+
+class ICalendarRenderer(BaseRenderer):
+    """
+    Lets views stream text/calendar responses to clients that ask for it.
+    The calendar itself is produced by base.calendar; only error responses
+    pass through render().
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode(self.charset)
+
+
+class NDJSONRenderer(JSONRenderer):
+    """
+    Accepts clients asking for newline-delimited JSON. Streams are produced
+    by base.export; anything rendered here (errors) is a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context) + b'\n'
+
+
+def _encode_msgpack(obj):
+    if isinstance(obj, datetime.time):
+        return minutes(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID, Promise)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Compact binary alternative to JSON for mobile clients, selected with
+    `Accept: application/msgpack`. Times of day are sent as minutes after
+    midnight (see MinuteTimeField) instead of "HH:MM:SS" strings.
+    Requires the optional msgpack package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    compact_times = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_msgpack, use_bin_type=True)
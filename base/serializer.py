@@ -1,20 +1,103 @@
-from .models import TeacherProfile, AcademicProfile, Qualification, Availability
+import datetime
+
+from .models import TeacherProfile, AcademicProfile, Qualification, Availability, Booking, Subject, Medium, TeachingMode
+from .renderers import minutes
+from .taxonomy import get_taxonomy, taxonomy_cache
+from django.db import models
 from rest_framework import serializers
 
 
+class TaxonomyPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field for reference data (subjects, media, teaching modes)
+    validated against the in-process taxonomy cache instead of one query
+    per id. `taxonomy` names the Taxonomy attribute holding the ids.
+    """
+
+    def __init__(self, taxonomy, **kwargs):
+        self.taxonomy = taxonomy
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in getattr(get_taxonomy(), self.taxonomy):
+            self.fail('does_not_exist', pk_value=data)
+        return pk
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        field = super().many_init(*args, **kwargs)
+        field.__class__ = TaxonomyManyRelatedField
+        return field
+
+
+class TaxonomyManyRelatedField(serializers.ManyRelatedField):
+    """
+    List of TaxonomyPrimaryKeyRelatedField ids. The cache lags a deletion
+    until the version bump commits and is seen, so the ids that passed it
+    are confirmed with one query; a deleted id is then a validation error
+    instead of a foreign key failure when the relation is saved.
+    """
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        if pks:
+            found = set(self.child_relation.get_queryset().filter(pk__in=pks).values_list('pk', flat=True))
+            missing = [pk for pk in pks if pk not in found]
+            if missing:
+                taxonomy_cache.invalidate()
+                self.child_relation.fail('does_not_exist', pk_value=missing[0])
+        return pks
+
+
+class MinuteTimeField(serializers.TimeField):
+    """
+    Time field rendered as minutes after midnight when the accepted renderer
+    asks for compact times (MessagePack), and as usual otherwise. Accepts
+    both forms as input.
+    """
 
+    def to_representation(self, value):
+        request = self.context.get('request')
+        renderer = getattr(request, 'accepted_renderer', None)
+        if value is not None and getattr(renderer, 'compact_times', False):
+            return minutes(value)
+        return super().to_representation(value)
 
-class AvailabilitySerializer(serializers.ModelSerializer):
+    def to_internal_value(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            if not 0 <= value < 24 * 60:
+                self.fail('invalid', format='minutes after midnight (0-1439)')
+            return datetime.time(value // 60, value % 60)
+        return super().to_internal_value(value)
+
+
+class CompactTimeSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.TimeField: MinuteTimeField,
+    }
+
+
+class AvailabilitySerializer(CompactTimeSerializer):
     class Meta:
         model = Availability
         fields = '__all__'
 
         
 class TeacherProfileSerializer(serializers.ModelSerializer):
-    availability = AvailabilitySerializer(many=True, read_only=True, source='availability_set')
+    availability = AvailabilitySerializer(many=True, read_only=True, source='availabilities')
+    subject_list = TaxonomyPrimaryKeyRelatedField('subjects', queryset=Subject.objects.all(), many=True, required=False)
+    medium = TaxonomyPrimaryKeyRelatedField('media', queryset=Medium.objects.all(), many=True, required=False)
+    teaching_mode = TaxonomyPrimaryKeyRelatedField('teaching_modes', queryset=TeachingMode.objects.all(), many=True, required=False)
     class Meta:
         model = TeacherProfile
-        fields = '__all__'
+        exclude = ['booking_version', 'is_searchable', 'completeness_score']
 
 
 class AcademicProfileSerializer(serializers.ModelSerializer):
@@ -27,3 +110,15 @@ class QualificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Qualification
         fields = '__all__'
+
+
+class BookingSerializer(CompactTimeSerializer):
+    class Meta:
+        model = Booking
+        fields = ['id', 'tutor', 'student', 'date', 'start_time', 'end_time', 'status', 'created_at']
+        read_only_fields = ['student', 'status', 'created_at']
+
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError("End time must be after start time.")
+        return attrs
@@ -0,0 +1,210 @@
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (AcademicProfile, Availability, ChangeLogEntry, CustomUser, Grade, Medium, Qualification, Subject,
+                     TeacherProfile, TeachingMode)
+from . import calendar, eligibility, supply
+from .jobs import enqueue
+from .sync import log_changes
+from .tasks import refresh_tutor_indexes
+from .taxonomy import taxonomy_cache
+
+
+@receiver(pre_save, sender=AcademicProfile)
+@receiver(pre_save, sender=Qualification)
+def track_certificate_references(sender, instance, update_fields=None, **kwargs):
+    """
+    Keeps blob reference counts in step with the certificate a row points
+    at. Uploads are counted by the storage when they are stored; a name
+    assigned from another row is counted here. The replaced or cleared
+    blob is released once the new state is committed. Runs inside the
+    save's transaction (CertificateOwnerMixin), so a failed save undoes it.
+    """
+    if update_fields is not None and 'certificates' not in update_fields:
+        return
+    old_name = None
+    if instance.pk is not None:
+        old_name = sender.objects.filter(pk=instance.pk).values_list('certificates', flat=True).first()
+    new_file = instance.certificates
+    storage = sender._meta.get_field('certificates').storage
+    kept = bool(new_file) and new_file._committed
+    if kept and new_file.name != old_name:
+        storage.add_reference(new_file.name)
+    if old_name and not (kept and new_file.name == old_name):
+        transaction.on_commit(lambda: storage.delete(old_name))
+
+
+@receiver(post_delete, sender=AcademicProfile)
+@receiver(post_delete, sender=Qualification)
+def release_deleted_certificate(sender, instance, **kwargs):
+    if instance.certificates:
+        storage = instance.certificates.storage
+        name = instance.certificates.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+SYNC_KINDS = {
+    TeacherProfile: ChangeLogEntry.TEACHER,
+    Availability: ChangeLogEntry.AVAILABILITY,
+}
+
+
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_save, sender=Availability)
+def log_upsert(sender, instance, raw=False, **kwargs):
+    if not raw:
+        log_changes(SYNC_KINDS[sender], [instance.pk])
+
+
+@receiver(post_save, sender=Availability)
+def regenerate_calendar(sender, instance, raw=False, **kwargs):
+    # Deleted availability takes its calendar slots with it (CASCADE).
+    if not raw:
+        calendar.regenerate(instance)
+
+
+@receiver(post_delete, sender=TeacherProfile)
+@receiver(post_delete, sender=Availability)
+def log_delete(sender, instance, **kwargs):
+    log_changes(SYNC_KINDS[sender], [instance.pk], ChangeLogEntry.DELETE)
+
+
+TEACHER_M2M_FIELDS = {
+    TeacherProfile.subject_list.through: 'subject_list',
+    TeacherProfile.medium.through: 'medium',
+    TeacherProfile.teaching_mode.through: 'teaching_mode',
+}
+
+
+def _changed_teacher_ids(sender, instance, action, reverse, pk_set):
+    """Teacher ids whose relation changed, or None for actions to ignore."""
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        return [instance.pk]
+    if reverse and action in ('post_add', 'post_remove'):
+        return list(pk_set)
+    if reverse and action == 'pre_clear':
+        # e.g. subject.tutors.clear(): collect the tutors before the rows go.
+        field = TEACHER_M2M_FIELDS[sender]
+        return list(TeacherProfile.objects.filter(**{field: instance}).values_list('pk', flat=True))
+    return None
+
+
+@receiver(m2m_changed, sender=TeacherProfile.subject_list.through)
+@receiver(m2m_changed, sender=TeacherProfile.medium.through)
+@receiver(m2m_changed, sender=TeacherProfile.teaching_mode.through)
+def log_teacher_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    teacher_ids = _changed_teacher_ids(sender, instance, action, reverse, pk_set)
+    if teacher_ids is None:
+        return
+    TeacherProfile.objects.filter(pk__in=teacher_ids).update(updated_at=timezone.now())
+    log_changes(ChangeLogEntry.TEACHER, teacher_ids)
+
+
+@receiver(post_save, sender=TeacherProfile)
+def add_to_supply(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Off the request: a worker computes the supply cells and the
+        # eligibility flags of the new tutor (base.tasks).
+        enqueue(refresh_tutor_indexes, [instance.pk], idempotency_key=f"tutor-created:{instance.pk}")
+
+
+@receiver(pre_delete, sender=TeacherProfile)
+def remove_from_supply(sender, instance, **kwargs):
+    # Before the cascade drops the footprint the removal is computed from.
+    supply.remove_tutor(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_location_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'location' not in update_fields):
+        return
+    supply.schedule_refresh(TeacherProfile.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=TeacherProfile.subject_list.through)
+@receiver(m2m_changed, sender=TeacherProfile.teaching_mode.through)
+def supply_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    teacher_ids = _changed_teacher_ids(sender, instance, action, reverse, pk_set)
+    if teacher_ids is not None:
+        supply.schedule_refresh(teacher_ids)
+
+
+@receiver(pre_delete, sender=Subject)
+@receiver(pre_delete, sender=TeachingMode)
+def supply_taxonomy_deleted(sender, instance, **kwargs):
+    # The cascade removes the through rows without sending m2m_changed.
+    field = 'subject_list' if sender is Subject else 'teaching_mode'
+    supply.schedule_refresh(TeacherProfile.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+
+ELIGIBILITY_USER_FIELDS = {'location', 'banned'}
+ELIGIBILITY_TEACHER_FIELDS = {'verified', 'bio'}
+
+
+@receiver(post_save, sender=TeacherProfile)
+def teacher_eligibility_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # New tutors are handled by the job add_to_supply queues.
+    if created or raw:
+        return
+    if update_fields is None or ELIGIBILITY_TEACHER_FIELDS.intersection(update_fields):
+        eligibility.schedule_refresh([instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_eligibility_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not ELIGIBILITY_USER_FIELDS.intersection(update_fields)):
+        return
+    eligibility.schedule_refresh(TeacherProfile.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_save, sender=AcademicProfile)
+def profile_item_added(sender, instance, created, raw=False, **kwargs):
+    # Only the existence of these rows counts, so edits are not relevant.
+    if created and not raw:
+        eligibility.schedule_refresh([instance.tutor_id if sender is Availability else instance.teacher_id])
+
+
+@receiver(post_delete, sender=Availability)
+@receiver(post_delete, sender=AcademicProfile)
+def profile_item_removed(sender, instance, **kwargs):
+    eligibility.schedule_refresh([instance.tutor_id if sender is Availability else instance.teacher_id])
+
+
+@receiver(m2m_changed, sender=TeacherProfile.subject_list.through)
+@receiver(m2m_changed, sender=TeacherProfile.medium.through)
+@receiver(m2m_changed, sender=TeacherProfile.teaching_mode.through)
+def eligibility_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    teacher_ids = _changed_teacher_ids(sender, instance, action, reverse, pk_set)
+    if teacher_ids is not None:
+        eligibility.schedule_refresh(teacher_ids)
+
+
+@receiver(pre_delete, sender=Subject)
+@receiver(pre_delete, sender=Medium)
+@receiver(pre_delete, sender=TeachingMode)
+def eligibility_taxonomy_deleted(sender, instance, **kwargs):
+    # The cascade removes the through rows without sending m2m_changed.
+    field = {Subject: 'subject_list', Medium: 'medium', TeachingMode: 'teaching_mode'}[sender]
+    eligibility.schedule_refresh(TeacherProfile.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Medium)
+@receiver(post_save, sender=TeachingMode)
+@receiver(post_delete, sender=Grade)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Medium)
+@receiver(post_delete, sender=TeachingMode)
+def taxonomy_changed(sender, raw=False, **kwargs):
+    if not raw:
+        taxonomy_cache.bump()
+
+
+@receiver(m2m_changed, sender=Grade.medium.through)
+def grade_media_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        taxonomy_cache.bump()
@@ -0,0 +1,153 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'cas'
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every upload to a temporary file on disk (never into memory)
+    and computes its SHA-256 on the way, so ContentAddressedStorage does
+    not have to read the file a second time.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct file once, named after its SHA-256 digest
+    (cas/ab/cd/<digest>). The requested name is only used to guess the
+    content type; StoredBlob keeps a reference count per digest and the
+    file is removed when the last reference is deleted.
+    """
+
+    def blob_name(self, digest):
+        return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content, collisions are deduplicated in _save().
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        digest = getattr(content, 'sha256', None)
+        spooled_path = None
+        if digest is None:
+            digest, spooled_path = self._spool(content)
+        blob_name = self.blob_name(digest)
+
+        try:
+            with transaction.atomic():
+                blob, created = StoredBlob.objects.get_or_create(
+                    digest=digest,
+                    defaults={
+                        'size': content.size,
+                        'content_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                        'ref_count': 1,
+                    },
+                )
+                if not created:
+                    StoredBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+
+            path = self.path(blob_name)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if spooled_path is None:
+                    spooled_path = self._spool(content, directory=os.path.dirname(path))[1]
+                os.replace(spooled_path, path)
+                spooled_path = None
+        finally:
+            if spooled_path is not None:
+                os.unlink(spooled_path)
+        return blob_name
+
+    def _spool(self, content, directory=None):
+        """
+        Copies `content` chunk by chunk into a temporary file below the
+        storage root while hashing it. Returns (digest, temporary path).
+        """
+        directory = directory or self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    handle.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        return hasher.hexdigest(), tmp_path
+
+    def add_reference(self, name):
+        """
+        Counts one more reference to an already stored blob, e.g. a name
+        copied from another row. Returns False if the blob is unknown.
+        """
+        from .models import StoredBlob
+
+        return bool(StoredBlob.objects.filter(pk=os.path.basename(name)).update(ref_count=F('ref_count') + 1))
+
+    def delete(self, name):
+        """
+        Drops one reference to the blob and removes the file with the last one.
+        Files stored before content addressing (certificates/<user>/<file>)
+        have no blob; they are removed once no certificate row names them.
+        """
+        from .models import StoredBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if not name.startswith(f"{BLOB_PREFIX}/"):
+            if not self._legacy_name_in_use(name):
+                super().delete(name)
+            return
+        digest = os.path.basename(name)
+        with transaction.atomic():
+            StoredBlob.objects.filter(pk=digest, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            deleted, _ = StoredBlob.objects.filter(pk=digest, ref_count=0).delete()
+            if deleted:
+                # Inside the transaction so a concurrent _save() of the same
+                # content either sees the row or re-creates the file.
+                super().delete(name)
+
+    def _legacy_name_in_use(self, name):
+        from .models import AcademicProfile, Qualification
+
+        return any(model.objects.filter(certificates=name).exists() for model in (AcademicProfile, Qualification))
+
+
+
+def get_certificate_storage():
+    return certificate_storage
+
+
+certificate_storage = ContentAddressedStorage()
@@ -0,0 +1,227 @@
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import SupplyCell, SupplyFootprint, TeacherProfile
+
+SUPPLY_HEATMAP_DEFAULTS = {
+    # Zoom levels aggregated. Changing them requires rebuild_supply.
+    'MIN_ZOOM': 5,
+    'MAX_ZOOM': 13,
+    # A tile request returns the cells this many levels below the tile,
+    # i.e. a 2**n by 2**n grid.
+    'TILE_DETAIL': 3,
+}
+
+ANY = 0
+
+BULK_BATCH_SIZE = 1000
+
+
+def get_config():
+    config = dict(SUPPLY_HEATMAP_DEFAULTS)
+    config.update(getattr(settings, 'SUPPLY_HEATMAP', {}))
+    return config
+
+
+def parse_location(location):
+    """Returns (lat, lon) from a "lat,lon,accuracy" string, or None."""
+    try:
+        lat, lon = (float(part) for part in (location or '').split(',')[:2])
+    except ValueError:
+        return None
+    if not (-85.0511 <= lat <= 85.0511 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def tile_for(lat, lon, zoom):
+    """Web Mercator ("slippy map") tile containing the point."""
+    scale = 2 ** zoom
+    x = int((lon + 180) / 360 * scale)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * scale)
+    return min(x, scale - 1), min(y, scale - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """(west, south, east, north) of a tile in degrees."""
+    scale = 2 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / scale))))
+
+    return x / scale * 360 - 180, lat(y + 1), (x + 1) / scale * 360 - 180, lat(y)
+
+
+def cells_of(footprint, config=None):
+    """The SupplyCell keys a footprint (x, y, subjects, modes) counts in."""
+    if footprint is None:
+        return []
+    config = config or get_config()
+    x, y, subjects, modes = footprint
+    return [
+        (zoom, x >> (config['MAX_ZOOM'] - zoom), y >> (config['MAX_ZOOM'] - zoom), subject, mode)
+        for zoom in range(config['MIN_ZOOM'], config['MAX_ZOOM'] + 1)
+        for subject in (ANY, *subjects)
+        for mode in (ANY, *modes)
+    ]
+
+
+def current_footprints(tutor_ids, config=None):
+    """Computes {tutor id: (x, y, subjects, modes)} from the tutors' current state."""
+    config = config or get_config()
+    subjects, modes = {}, {}
+    through_tables = (
+        (TeacherProfile.subject_list.through, 'subject_id', subjects),
+        (TeacherProfile.teaching_mode.through, 'teachingmode_id', modes),
+    )
+    for through, column, target in through_tables:
+        rows = through.objects.filter(teacherprofile_id__in=tutor_ids).values_list('teacherprofile_id', column)
+        for tutor_id, related_id in rows:
+            target.setdefault(tutor_id, []).append(related_id)
+    footprints = {}
+    for tutor_id, location in TeacherProfile.objects.filter(pk__in=tutor_ids).values_list('pk', 'user__location'):
+        point = parse_location(location)
+        if point is not None:
+            x, y = tile_for(*point, config['MAX_ZOOM'])
+            footprints[tutor_id] = (x, y, tuple(sorted(subjects.get(tutor_id, ()))), tuple(sorted(modes.get(tutor_id, ()))))
+    return footprints
+
+
+def _key_filter(keys):
+    tiles = Q()
+    for zoom, x, y in {key[:3] for key in keys}:
+        tiles |= Q(zoom=zoom, x=x, y=y)
+    return tiles
+
+
+def apply_deltas(deltas):
+    """Adds `deltas` ({cell key: change}) to the cell counts, creating and removing cells as needed."""
+    deltas = {key: change for key, change in deltas.items() if change}
+    if not deltas:
+        return
+    existing = {
+        (cell.zoom, cell.x, cell.y, cell.subject, cell.teaching_mode): cell.pk
+        for cell in SupplyCell.objects.filter(_key_filter(deltas)).only('pk', 'zoom', 'x', 'y', 'subject', 'teaching_mode')
+    }
+    by_change = {}
+    missing = []
+    for key, change in deltas.items():
+        if key in existing:
+            by_change.setdefault(change, []).append(existing[key])
+        elif change > 0:
+            missing.append(key)
+    # One UPDATE per distinct change (usually just +1 and -1); F() keeps
+    # concurrent writers from losing each other's increments.
+    for change, pks in by_change.items():
+        SupplyCell.objects.filter(pk__in=pks).update(count=F('count') + change)
+    try:
+        with transaction.atomic():
+            SupplyCell.objects.bulk_create(
+                SupplyCell(zoom=zoom, x=x, y=y, subject=subject, teaching_mode=mode, count=deltas[zoom, x, y, subject, mode])
+                for zoom, x, y, subject, mode in missing
+            )
+    except IntegrityError:
+        # Another writer created some of these cells in the meantime.
+        for zoom, x, y, subject, mode in missing:
+            cell, created = SupplyCell.objects.get_or_create(
+                zoom=zoom, x=x, y=y, subject=subject, teaching_mode=mode,
+                defaults={'count': deltas[zoom, x, y, subject, mode]},
+            )
+            if not created:
+                SupplyCell.objects.filter(pk=cell.pk).update(count=F('count') + deltas[zoom, x, y, subject, mode])
+    if any(change < 0 for change in by_change):
+        SupplyCell.objects.filter(pk__in=[pk for change, pks in by_change.items() if change < 0 for pk in pks], count=0).delete()
+
+
+def refresh_tutors(tutor_ids):
+    """
+    Brings the tutors' contribution to the heatmap up to date: their stored
+    footprints are diffed against their current location, subjects and
+    teaching modes, and only the difference is applied. Deleted tutors (or
+    tutors without a usable location) are removed. Call this after bulk
+    updates that bypass model signals.
+    """
+    tutor_ids = set(tutor_ids)
+    if not tutor_ids:
+        return
+    config = get_config()
+    with transaction.atomic():
+        # Lock the tutor rows (in pk order, so concurrent refreshes cannot
+        # deadlock) before reading the footprints: two refreshes of one
+        # tutor would otherwise both apply the same delta. Tutor rows also
+        # exist for tutors without a footprint yet. SQLite has no row locks;
+        # there the second writer fails with "database is locked" instead.
+        list(TeacherProfile.objects.select_for_update().filter(pk__in=tutor_ids).order_by('pk').values_list('pk', flat=True))
+        stored = {
+            footprint.tutor_id: (footprint.x, footprint.y, tuple(footprint.subjects), tuple(footprint.teaching_modes))
+            for footprint in SupplyFootprint.objects.filter(tutor_id__in=tutor_ids)
+        }
+        current = current_footprints(tutor_ids, config)
+        deltas = Counter()
+        changed = [tutor_id for tutor_id in tutor_ids if stored.get(tutor_id) != current.get(tutor_id)]
+        for tutor_id in changed:
+            deltas.subtract(cells_of(stored.get(tutor_id), config))
+            deltas.update(cells_of(current.get(tutor_id), config))
+        apply_deltas(deltas)
+        SupplyFootprint.objects.filter(tutor_id__in=[tutor_id for tutor_id in changed if tutor_id not in current]).delete()
+        for tutor_id in changed:
+            if tutor_id in current:
+                x, y, subjects, modes = current[tutor_id]
+                SupplyFootprint.objects.update_or_create(
+                    tutor_id=tutor_id, defaults={'x': x, 'y': y, 'subjects': list(subjects), 'teaching_modes': list(modes)},
+                )
+
+
+def remove_tutor(tutor_id):
+    """Takes a tutor that is about to be deleted off the heatmap."""
+    footprint = SupplyFootprint.objects.filter(tutor_id=tutor_id).first()
+    if footprint is None:
+        return
+    stored = (footprint.x, footprint.y, tuple(footprint.subjects), tuple(footprint.teaching_modes))
+    apply_deltas({key: -1 for key in cells_of(stored)})
+    footprint.delete()
+
+
+def schedule_refresh(tutor_ids):
+    """Refreshes the tutors once the current transaction commits."""
+    tutor_ids = list(tutor_ids)
+    if tutor_ids:
+        transaction.on_commit(lambda: refresh_tutors(tutor_ids))
+
+
+def rebuild():
+    """Recomputes every cell and footprint from scratch. Returns the number of cells."""
+    config = get_config()
+    counts = Counter()
+    footprints = []
+    with transaction.atomic():
+        tutor_ids = list(TeacherProfile.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(tutor_ids), BULK_BATCH_SIZE):
+            batch = current_footprints(tutor_ids[start:start + BULK_BATCH_SIZE], config)
+            for tutor_id, footprint in batch.items():
+                counts.update(cells_of(footprint, config))
+                x, y, subjects, modes = footprint
+                footprints.append(SupplyFootprint(
+                    tutor_id=tutor_id, x=x, y=y, subjects=list(subjects), teaching_modes=list(modes),
+                ))
+        SupplyCell.objects.all().delete()
+        SupplyFootprint.objects.all().delete()
+        SupplyFootprint.objects.bulk_create(footprints, batch_size=BULK_BATCH_SIZE)
+        SupplyCell.objects.bulk_create(
+            (SupplyCell(zoom=zoom, x=x, y=y, subject=subject, teaching_mode=mode, count=count)
+             for (zoom, x, y, subject, mode), count in counts.items()),
+            batch_size=BULK_BATCH_SIZE,
+        )
+    return len(counts)
+
+
+def heatmap(zoom, x_range, y_range, subject=ANY, teaching_mode=ANY):
+    """Yields (x, y, count) for the non-empty cells of one zoom level in the given tile ranges (inclusive)."""
+    return SupplyCell.objects.filter(
+        zoom=zoom, subject=subject, teaching_mode=teaching_mode,
+        x__range=x_range, y__range=y_range,
+    ).order_by('x', 'y').values_list('x', 'y', 'count')
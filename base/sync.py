@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .export import tutor_queryset
+from .models import Availability, CacheVersion, ChangeLogEntry
+from .serializer import AvailabilitySerializer, TeacherProfileSerializer
+
+SYNC_FEED_DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    # prune_changelog deletes entries older than this.
+    'RETENTION_DAYS': 30,
+}
+
+# CacheVersion row holding the last sequence number handed out.
+SEQUENCE_NAME = 'sync.changelog'
+
+BULK_BATCH_SIZE = 500
+
+# kind -> (serializer, queryset factory)
+SYNCED_MODELS = {
+    ChangeLogEntry.TEACHER: (
+        TeacherProfileSerializer,
+        tutor_queryset,
+    ),
+    ChangeLogEntry.AVAILABILITY: (
+        AvailabilitySerializer,
+        lambda: Availability.objects.order_by(),
+    ),
+}
+
+
+class CursorExpired(Exception):
+    """The requested cursor points at log entries that were already pruned."""
+
+
+def get_config():
+    config = dict(SYNC_FEED_DEFAULTS)
+    config.update(getattr(settings, 'SYNC_FEED', {}))
+    return config
+
+
+def log_changes(kind, object_ids, operation=ChangeLogEntry.UPSERT):
+    """
+    Appends one log entry per object id. Use this after bulk updates that
+    bypass model signals. The entries get their sequence numbers once the
+    current transaction commits.
+    """
+    ChangeLogEntry.objects.bulk_create(
+        ChangeLogEntry(kind=kind, object_id=object_id, operation=operation) for object_id in object_ids
+    )
+    transaction.on_commit(assign_sequences)
+
+
+def assign_sequences():
+    """
+    Numbers the committed entries that have no sequence yet; returns how
+    many. Ids are allocated at insert time and a transaction can commit a
+    lower id after readers moved past it, so cursors use these numbers
+    instead. The counter row stays locked until the numbers commit, so they
+    become visible in order and a reader never skips one. Entries whose
+    on_commit hook did not run are numbered by the next call (or by prune()).
+    """
+    unnumbered = ChangeLogEntry.objects.filter(sequence__isnull=True)
+    if not unnumbered.exists():
+        # Every hook of a transaction that logged several changes runs;
+        # the first one numbered them all.
+        return 0
+    assigned = 0
+    with transaction.atomic():
+        counter = CacheVersion.objects.filter(name=SEQUENCE_NAME)
+        # Writing the row first takes its lock (and SQLite's write lock)
+        # before the counter is read.
+        if not counter.update(version=F('version')):
+            CacheVersion.objects.get_or_create(name=SEQUENCE_NAME)
+            counter.update(version=F('version'))
+        last = counter.values_list('version', flat=True).get()
+        while True:
+            pending = list(unnumbered.order_by('pk').values_list('pk', flat=True)[:BULK_BATCH_SIZE])
+            if not pending:
+                break
+            ChangeLogEntry.objects.bulk_update(
+                [ChangeLogEntry(pk=pk, sequence=last + offset) for offset, pk in enumerate(pending, 1)],
+                ['sequence'],
+            )
+            last += len(pending)
+            assigned += len(pending)
+        if assigned:
+            counter.update(version=last)
+    return assigned
+
+
+def changes_since(cursor, limit=None, request=None):
+    """
+    Returns the changes logged after `cursor`, collapsed to the latest
+    operation per object:
+
+        {"cursor": <new cursor>, "has_more": bool,
+         "<kind>": {"upserts": [serialized objects], "deletes": [ids]}, ...}
+
+    Raises CursorExpired when entries after `cursor` have been pruned and
+    the client has to download everything again. `request` is handed to the
+    serializers, which format times for its accepted renderer.
+    """
+    config = get_config()
+    limit = min(limit or config['PAGE_SIZE'], config['MAX_PAGE_SIZE'])
+
+    numbered = ChangeLogEntry.objects.filter(sequence__isnull=False)
+    oldest = numbered.order_by('sequence').values_list('sequence', flat=True).first()
+    if oldest is not None and cursor < oldest - 1:
+        raise CursorExpired
+
+    entries = list(
+        numbered.filter(sequence__gt=cursor)
+        .order_by('sequence')
+        .values_list('sequence', 'kind', 'object_id', 'operation')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for sequence, kind, object_id, operation in entries:
+        latest[(kind, object_id)] = operation
+
+    result = {
+        'cursor': entries[-1][0] if entries else cursor,
+        'has_more': has_more,
+    }
+    for kind, (serializer_class, get_queryset) in SYNCED_MODELS.items():
+        upsert_ids = [object_id for (entry_kind, object_id), op in latest.items()
+                      if entry_kind == kind and op == ChangeLogEntry.UPSERT]
+        deletes = [object_id for (entry_kind, object_id), op in latest.items()
+                   if entry_kind == kind and op == ChangeLogEntry.DELETE]
+        objects = list(get_queryset().filter(pk__in=upsert_ids)) if upsert_ids else []
+        # Upserted and then deleted in a later (not yet returned) entry.
+        found = {obj.pk for obj in objects}
+        deletes.extend(object_id for object_id in upsert_ids if object_id not in found)
+        result[kind] = {
+            'upserts': serializer_class(objects, many=True, context={'request': request}).data,
+            'deletes': sorted(deletes),
+        }
+    return result
+
+
+def prune(retention_days=None):
+    """
+    Deletes log entries older than the retention period, except the newest
+    entry. It stays as a marker of the highest sequence handed out: with an
+    empty log, changes_since() could not tell a stale cursor from an
+    up-to-date one. Entries left unnumbered are numbered first.
+    """
+    days = get_config()['RETENTION_DAYS'] if retention_days is None else retention_days
+    assign_sequences()
+    newest = (
+        ChangeLogEntry.objects.filter(sequence__isnull=False).order_by('-sequence')
+        .values_list('pk', flat=True).first()
+    )
+    deleted, _ = ChangeLogEntry.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days)
+    ).exclude(pk=newest).delete()
+    return deleted
@@ -0,0 +1,12 @@
+from . import eligibility, supply
+from .jobs import task
+
+
+@task()
+def refresh_tutor_indexes(tutor_ids):
+    """
+    Brings the derived tutor data (supply heatmap cells, eligibility flags)
+    up to date for `tutor_ids`. Queued for new tutors, see signals.
+    """
+    supply.refresh_tutors(tutor_ids)
+    eligibility.refresh(tutor_ids)
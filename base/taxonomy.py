@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from .models import CacheVersion, Grade, Medium, Subject, TeachingMode
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'taxonomy'
+
+# Seconds between checks of the shared version stamp.
+DEFAULT_CHECK_INTERVAL = 5.0
+
+GradeEntry = namedtuple('GradeEntry', ['id', 'name', 'sequence', 'medium_ids'])
+SubjectEntry = namedtuple('SubjectEntry', ['id', 'name', 'code', 'grade_id'])
+NamedEntry = namedtuple('NamedEntry', ['id', 'name'])
+
+
+class Taxonomy:
+    """
+    Immutable snapshot of the reference data: grades (with their media),
+    subjects (with their grade), media and teaching modes, keyed by id.
+    """
+
+    def __init__(self, version, grades, subjects, media, teaching_modes):
+        self.version = version
+        self.grades = grades
+        self.subjects = subjects
+        self.media = media
+        self.teaching_modes = teaching_modes
+
+    @classmethod
+    def load(cls, version):
+        grade_media = {}
+        for grade_id, medium_id in Grade.medium.through.objects.values_list('grade_id', 'medium_id'):
+            grade_media.setdefault(grade_id, set()).add(medium_id)
+        return cls(
+            version=version,
+            grades={
+                pk: GradeEntry(pk, name, sequence, frozenset(grade_media.get(pk, ())))
+                for pk, name, sequence in Grade.objects.values_list('pk', 'name', 'sequence')
+            },
+            subjects={
+                pk: SubjectEntry(pk, name, code, grade_id)
+                for pk, name, code, grade_id in Subject.objects.values_list('pk', 'name', 'subject_code', 'grade_id')
+            },
+            media={pk: NamedEntry(pk, name) for pk, name in Medium.objects.values_list('pk', 'name')},
+            teaching_modes={pk: NamedEntry(pk, name) for pk, name in TeachingMode.objects.values_list('pk', 'name')},
+        )
+
+    def subjects_for_grade(self, grade_id):
+        return [subject for subject in self.subjects.values() if subject.grade_id == grade_id]
+
+
+class TaxonomyCache:
+    """
+    Process-local taxonomy cache. The shared CacheVersion row is read at
+    most every TAXONOMY_CACHE_CHECK_INTERVAL seconds; the snapshot is only
+    reloaded when another process (or this one) bumped it.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        return CacheVersion.objects.filter(name=CACHE_NAME).values_list('version', flat=True).first() or 0
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or time.monotonic() >= self._next_check:
+                version = self._current_version()
+                if self._snapshot is None or self._snapshot.version != version:
+                    self._snapshot = Taxonomy.load(version)
+                self._next_check = time.monotonic() + getattr(
+                    settings, 'TAXONOMY_CACHE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL
+                )
+            return self._snapshot
+
+    def invalidate(self):
+        """Forces a version check on the next access in this process."""
+        self._next_check = 0.0
+
+    def bump(self):
+        """
+        Marks the taxonomy as changed for every process, once the current
+        transaction commits.
+        """
+        def _bump():
+            updated = CacheVersion.objects.filter(name=CACHE_NAME).update(version=F('version') + 1)
+            if not updated:
+                CacheVersion.objects.get_or_create(name=CACHE_NAME, defaults={'version': 1})
+            self.invalidate()
+        transaction.on_commit(_bump)
+
+    def warm(self):
+        """Loads the snapshot ahead of the first request; never fails start-up."""
+        try:
+            self.get()
+        except DatabaseError:
+            logger.warning("Could not warm the taxonomy cache", exc_info=True)
+
+
+taxonomy_cache = TaxonomyCache()
+
+
+def get_taxonomy():
+    return taxonomy_cache.get()
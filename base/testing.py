@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from .instrumentation import capture_queries
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Keeps state that worker processes share through files out of the
+    server's directories during test runs. Test databases hand out the same
+    primary keys on every run, so throttle buckets keyed by user would
+    otherwise carry over from one run to the next, and test requests would
+    show up in the server's metrics.
+    """
+    isolated_settings = {
+        'THROTTLE_STATE': {'FILE': None},
+        'METRICS': {'DIR': None},
+    }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolation = override_settings(**self.isolated_settings)
+        self._isolation.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolation.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for asserting that code paths and endpoints stay within a
+    query budget. Unlike assertNumQueries it only fails when the budget is
+    exceeded, so endpoints can get cheaper without breaking their tests.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=None):
+        with capture_queries(using=using, record=True) as stats:
+            yield stats
+        if stats.count > budget:
+            statements = "\n".join(
+                f"{index}. {sql}" for index, sql in enumerate(stats.statements, start=1)
+            )
+            self.fail(
+                f"{stats.count} queries executed, budget is {budget}. "
+                f"Slowest from {stats.slowest_origin}.\nCaptured queries were:\n{statements}"
+            )
+
+    def assertEndpointQueryBudget(self, method, url, budget, **kwargs):
+        """
+        Calls `url` with the test client and fails if the request runs more
+        than `budget` queries. Returns the response for further assertions.
+        """
+        with self.assertQueryBudget(budget):
+            response = getattr(self.client, method.lower())(url, **kwargs)
+        return response
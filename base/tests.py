@@ -1,8 +1,56 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock, skipIf
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.conf import settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
-from datetime import time
-from .models import TeacherProfile, Availability # Import your models
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, time, timedelta
+from .models import (TeacherProfile, Availability, AcademicProfile, StoredBlob, Job, # Import your models
+                     Subject, ChangeLogEntry, Grade, Medium, CacheVersion, Booking,
+                     CalendarSlot, SupplyCell, TeachingMode)
 from .utils import find_available_tutors # Import the function to be tested
+from .instrumentation import capture_queries
+from .testing import QueryBudgetMixin
+from .metrics import registry, render_prometheus
+from .management.commands.startup_profile import parse_importtime
+from . import jobs
+from .jobs import Worker, enqueue, task
+from .admin import EstimatedCountPaginator, ban_teachers, verify_teachers
+from .sync import CursorExpired, assign_sequences, changes_since
+from .taxonomy import get_taxonomy, taxonomy_cache
+from .autocomplete import autocomplete
+from .booking import SlotUnavailable, book_slot
+from .calendar import extend as extend_calendar, free_slots
+from . import supply
+from .export import accepts_gzip, iter_tutors
+from .renderers import msgpack
+from .locations import location_buffer
+from .authentication import SingleFlight, claims_cache, refresh_flight, token_digest
+from .throttling import BucketTable, TokenBucketThrottle, client_ip
+from . import eligibility
+from .serializer import TeacherProfileSerializer
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+
+def auth_headers(user):
+    return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
 
 class FindAvailableTutorsTestCase(TestCase):
     """
@@ -167,4 +215,1286 @@ class FindAvailableTutorsTestCase(TestCase):
         desired_start = time(9, 0)
         desired_end = time(10, 0)
         found_tutors = find_available_tutors(desired_day, desired_start, desired_end)
-        self.assertEqual(len(found_tutors), 0)
\ No newline at end of file
+        self.assertEqual(len(found_tutors), 0)
+
+class QueryInstrumentationTestCase(QueryBudgetMixin, TestCase):
+    """
+    Test suite for the per-request query instrumentation.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="junaid", email="junaid@gmail.com")
+        self.tutor = TeacherProfile.objects.create(user=self.user)
+        Availability.objects.create(tutor=self.tutor, day_of_week='MON',
+                                   start_time=time(9, 0), end_time=time(12, 0))
+
+    def test_capture_counts_queries_and_slowest_origin(self):
+        with capture_queries() as stats:
+            slot = Availability.objects.get(tutor=self.tutor)
+            str(slot)  # walks tutor -> user
+        self.assertEqual(stats.count, 3)
+        self.assertIsNotNone(stats.slowest_sql)
+        self.assertIn("base/", stats.slowest_origin)
+
+    @override_settings(QUERY_INSTRUMENTATION={"HEADERS": True})
+    def test_headers_exposed(self):
+        response = self.client.get(reverse('base:home'))
+        self.assertIn('X-DB-Query-Count', response)
+        self.assertIn('X-DB-Time-Ms', response)
+        self.assertIn('X-DB-Slowest-Ms', response)
+
+    def test_endpoint_query_budget(self):
+        response = self.assertEndpointQueryBudget('get', reverse('base:home'), 0)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget(1):
+                str(Availability.objects.get(tutor=self.tutor))
+
+
+class MetricsTestCase(TestCase):
+    """
+    Test suite for the metrics registry and the Prometheus endpoint.
+    """
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+        self.enterContext(override_settings(METRICS={'DIR': self.metrics_dir}))
+        registry.reset()
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(username="admin", email="admin@gmail.com", password="pass")
+        self.user = User.objects.create_user(username="junaid", email="junaid@gmail.com", password="pass")
+
+    def test_histogram_rendering(self):
+        labels = (('view', 'base:home'),)
+        registry.observe('tutoria_http_request_duration_seconds', labels, 0.02)
+        registry.observe('tutoria_http_request_duration_seconds', labels, 3.0)
+        output = render_prometheus(*registry.collect())
+        self.assertIn('tutoria_http_request_duration_seconds_bucket{view="base:home",le="0.01"} 0', output)
+        self.assertIn('tutoria_http_request_duration_seconds_bucket{view="base:home",le="0.025"} 1', output)
+        self.assertIn('tutoria_http_request_duration_seconds_bucket{view="base:home",le="+Inf"} 2', output)
+        self.assertIn('tutoria_http_request_duration_seconds_count{view="base:home"} 2', output)
+
+    def test_snapshots_of_other_processes_are_merged(self):
+        other = {'histograms': [], 'counters': [['tutoria_http_responses_total', {'view': 'base:home', 'status': '200'}, 5]]}
+        with open(os.path.join(self.metrics_dir, 'other-worker.json'), 'w') as handle:
+            json.dump(other, handle)
+        registry.inc('tutoria_http_responses_total', (('view', 'base:home'), ('status', '200')), 2)
+        registry.flush(force=True)
+        output = render_prometheus(*registry.collect())
+        self.assertIn('tutoria_http_responses_total{status="200",view="base:home"} 7', output)
+
+    def test_snapshots_of_dead_processes_are_compacted(self):
+        dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        counter = ['tutoria_http_responses_total', {'view': 'base:home', 'status': '200'}, 5]
+        for name in (f"{dead.stdout.strip()}-deadbeef.json", 'retired.json'):
+            with open(os.path.join(self.metrics_dir, name), 'w') as handle:
+                json.dump({'histograms': [], 'counters': [counter]}, handle)
+        output = render_prometheus(*registry.collect())
+        self.assertIn('tutoria_http_responses_total{status="200",view="base:home"} 10', output)
+        self.assertEqual(os.listdir(self.metrics_dir), ['retired.json'])
+        self.assertEqual(render_prometheus(*registry.collect()), output)
+
+    def test_shards_of_exited_threads_are_retired(self):
+        labels = (('view', 'base:home'), ('status', '200'))
+        workers = [threading.Thread(target=registry.inc, args=('tutoria_http_responses_total', labels)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+            worker.join()
+        shards = len(registry._shards)
+        self.assertEqual(registry.snapshot()['counters'][0][2], 3)
+        self.assertEqual(len(registry._shards), shards - 3)
+
+    def test_only_flushing_processes_write_at_exit(self):
+        registry.flush_at_exit()
+        self.assertEqual(os.listdir(self.metrics_dir), [])
+        registry.flush(force=True)
+        self.enterContext(override_settings(METRICS={'DIR': os.path.join(self.metrics_dir, 'elsewhere')}))
+        registry.flush_at_exit()
+        self.assertFalse(os.path.exists(os.path.join(self.metrics_dir, 'elsewhere')))
+
+    def test_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse('base:metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('base:metrics'), headers=auth_headers(self.user)).status_code, 403)
+        self.client.get(reverse('base:home'))
+        response = self.client.get(reverse('base:metrics'), headers=auth_headers(self.admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('tutoria_http_responses_total{status="200",view="base:home"} 1', response.content.decode())
+
+
+class StartupTestCase(TestCase):
+    """
+    Test suite for start-up cost of the optional authentication backends.
+    """
+
+    def test_google_auth_is_not_imported_at_startup(self):
+        script = (
+            "import django, sys; django.setup(); import tutoria.urls, base.authentication; "
+            "sys.exit(int(any(name.startswith(('google', 'dotenv')) for name in sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'tutoria.settings'},
+            capture_output=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |     google.auth\n"
+            "import time:        50 |        150 |   google\n"
+        )
+        modules, packages = parse_importtime(output)
+        self.assertEqual(modules, {'google.auth': 100, 'google': 150})
+        self.assertEqual(packages, {'google': 150})
+
+
+class CertificateStorageTestCase(TestCase):
+    """
+    Test suite for content-addressed certificate storage and downloads.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        User = get_user_model()
+        self.user = User.objects.create_user(username="junaid", email="junaid@gmail.com")
+        self.other = User.objects.create_user(username="tarikul", email="tarikul@gmail.com")
+        self.tutor = TeacherProfile.objects.create(user=self.user)
+
+    def upload(self, content=b"%PDF-1.4 scanned certificate"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AcademicProfile.objects.create(
+                teacher=self.tutor, certificates=SimpleUploadedFile("scan.pdf", content)
+            )
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(first.certificates.name, second.certificates.name)
+        self.assertTrue(first.certificates.name.startswith('cas/'))
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.content_type, 'application/pdf')
+
+        path = first.certificates.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_replacing_certificate_releases_old_blob(self):
+        profile = self.upload(b"old scan")
+        old_path = profile.certificates.path
+        profile.certificates = SimpleUploadedFile("scan.pdf", b"new scan")
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_legacy_files_are_removed_with_their_last_row(self):
+        name = f"certificates/{self.user.pk}/old-scan.pdf"
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as handle:
+            handle.write(b"scan from before content addressing")
+        with self.captureOnCommitCallbacks(execute=True):
+            first = AcademicProfile.objects.create(teacher=self.tutor, certificates=name)
+            second = AcademicProfile.objects.create(teacher=self.tutor, certificates=name)
+
+        first.certificates = SimpleUploadedFile("scan.pdf", b"new scan")
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_copied_names_are_counted_and_failed_saves_roll_back(self):
+        first = self.upload()
+        path = first.certificates.path
+        with self.captureOnCommitCallbacks(execute=True):
+            copy = AcademicProfile.objects.create(teacher=self.tutor, certificates=first.certificates.name)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError):
+                AcademicProfile.objects.create(
+                    teacher=self.tutor, graduation_year=-1, certificates=SimpleUploadedFile("scan.pdf", b"other scan"),
+                )
+            with self.assertRaises(IntegrityError):
+                copy.graduation_year = -1
+                copy.certificates = None
+                copy.save()
+        self.assertEqual(list(StoredBlob.objects.values_list('ref_count', flat=True)), [1])
+        self.assertTrue(os.path.exists(path))
+
+    def test_download_supports_ranges_and_etag(self):
+        profile = self.upload(b"0123456789")
+        url = reverse('base:certificate_download', args=['academic', profile.pk])
+        self.assertEqual(self.client.get(url, headers=auth_headers(self.other)).status_code, 403)
+
+        response = self.client.get(url, headers={**auth_headers(self.user), 'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get(url, headers=auth_headers(self.user))
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        response = self.client.get(url, headers={**auth_headers(self.user), 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, headers={**auth_headers(self.user), 'Range': 'bytes=20-'})
+        self.assertEqual(response.status_code, 416)
+
+
+calls = []
+
+
+@task(name='tests.record')
+def record_call(value, fail_times=0):
+    calls.append(value)
+    if calls.count(value) <= fail_times:
+        raise RuntimeError("temporary failure")
+
+
+class JobQueueTestCase(TestCase):
+    """
+    Test suite for the database backed job queue.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_by_priority(self):
+        enqueue(record_call, 'low')
+        enqueue('tests.record', 'high', priority=10)
+        self.assertEqual(Worker().run_pending(), 2)
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+
+    def test_idempotency_key_deduplicates(self):
+        first = enqueue(record_call, 'once', idempotency_key='verify-teacher-1')
+        second = enqueue(record_call, 'once', idempotency_key='verify-teacher-1')
+        self.assertEqual(first.pk, second.pk)
+        Worker().run_pending()
+        self.assertEqual(calls, ['once'])
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        job = enqueue(record_call, 'flaky', fail_times=1, max_attempts=2)
+        with self.assertLogs('base.jobs', 'WARNING'):
+            Worker().run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("temporary failure", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        Worker().run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+
+    def test_job_fails_after_max_attempts(self):
+        job = enqueue(record_call, 'broken', fail_times=5, max_attempts=1)
+        with self.assertLogs('base.jobs', 'WARNING'):
+            Worker().run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_heartbeat_keeps_long_jobs_and_lost_jobs_run_out_of_attempts(self):
+        worker = Worker()
+        long_ago = timezone.now() - timedelta(hours=1)
+        running = enqueue(record_call, 'long')
+        retry = enqueue(record_call, 'retry', max_attempts=3)
+        exhausted = enqueue(record_call, 'exhausted', max_attempts=2)
+        Job.objects.filter(pk=running.pk).update(status=Job.RUNNING, locked_by=f"{worker.name}:0", locked_at=long_ago, attempts=1)
+        Job.objects.filter(pk=retry.pk).update(status=Job.RUNNING, locked_by="gone:1:0", locked_at=long_ago, attempts=1)
+        Job.objects.filter(pk=exhausted.pk).update(status=Job.RUNNING, locked_by="gone:1:0", locked_at=long_ago, attempts=2)
+
+        self.assertEqual(worker.heartbeat(), 1)
+        self.assertEqual(jobs.requeue_stale(), (1, 1))
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[running.pk], statuses[retry.pk], statuses[exhausted.pk]],
+            [Job.RUNNING, Job.QUEUED, Job.FAILED],
+        )
+
+
+class TeacherAdminTestCase(TestCase):
+    """
+    Test suite for the TeacherProfile admin and the verification queue.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(username="admin", email="admin@gmail.com", password="pass")
+        self.client.force_login(self.admin)
+
+    def create_tutors(self, count, start=0):
+        User = get_user_model()
+        return [
+            TeacherProfile.objects.create(user=User.objects.create_user(username=f"tutor{index}"))
+            for index in range(start, start + count)
+        ]
+
+    def changelist_queries(self, url):
+        with capture_queries() as stats:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return stats.count
+
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        for url in (reverse('admin:base_teacherprofile_changelist'), reverse('admin:base_pendingverification_changelist')):
+            self.create_tutors(3, start=len(TeacherProfile.objects.all()))
+            few = self.changelist_queries(url)
+            self.create_tutors(30, start=len(TeacherProfile.objects.all()))
+            self.assertEqual(self.changelist_queries(url), few)
+
+    def test_queue_lists_only_unverified_active_teachers(self):
+        pending, verified, banned = self.create_tutors(3)
+        TeacherProfile.objects.filter(pk=verified.pk).update(verified=True)
+        get_user_model().objects.filter(pk=banned.user_id).update(banned=True)
+        response = self.client.get(reverse('admin:base_pendingverification_changelist'))
+        self.assertEqual([obj.pk for obj in response.context['cl'].result_list], [pending.pk])
+
+    def test_bulk_actions_are_set_based(self):
+        tutors = self.create_tutors(20)
+        url = reverse('admin:base_teacherprofile_changelist')
+        selected = [tutor.pk for tutor in tutors]
+        with capture_queries() as verify_stats:
+            self.client.post(url, {'action': 'verify_teachers', '_selected_action': selected})
+        self.assertEqual(TeacherProfile.objects.filter(verified=True).count(), 20)
+        self.client.post(url, {'action': 'ban_teachers', '_selected_action': selected})
+        self.assertEqual(get_user_model().objects.filter(banned=True).count(), 20)
+        self.assertLess(verify_stats.count, 20)
+
+    def test_inlines_are_paginated(self):
+        tutor, = self.create_tutors(1)
+        for hour in range(0, 24):
+            Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(hour, 0), end_time=time(hour, 30))
+        url = reverse('admin:base_teacherprofile_change', args=[tutor.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.context['inline_admin_formsets'][1].formset.initial_form_count(), 10)
+        response = self.client.get(url + '?availabilities_page=3')
+        self.assertEqual(response.context['inline_admin_formsets'][1].formset.initial_form_count(), 4)
+
+    def change_form_data(self, response):
+        """POST data re-submitting the change form as rendered in `response`."""
+        forms = [response.context['adminform'].form]
+        for inline in response.context['inline_admin_formsets']:
+            forms.append(inline.formset.management_form)
+            forms.extend(inline.formset.forms)
+        data = {}
+        for form in forms:
+            for field in form:
+                value = field.value()
+                if value is None or value is False:
+                    continue
+                data[field.html_name] = 'on' if value is True else value
+        return data
+
+    def test_inline_page_links_keep_other_parameters(self):
+        tutor, = self.create_tutors(1)
+        for hour in range(0, 12):
+            Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(hour, 0), end_time=time(hour, 30))
+        url = reverse('admin:base_teacherprofile_change', args=[tutor.pk])
+        response = self.client.get(url, {'_changelist_filters': 'verified__exact=0', 'academic_profile_page': 'x'})
+        self.assertContains(
+            response, '?_changelist_filters=verified__exact%3D0&amp;academic_profile_page=x&amp;availabilities_page=2'
+        )
+
+    def test_saving_on_a_later_inline_page(self):
+        tutor, = self.create_tutors(1)
+        get_user_model().objects.filter(pk=tutor.user_id).update(location="23.8103,90.4125,10")
+        for hour in range(0, 12):
+            Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(hour, 0), end_time=time(hour, 30))
+        url = reverse('admin:base_teacherprofile_change', args=[tutor.pk])
+        response = self.client.get(url + '?availabilities_page=2')
+        data = self.change_form_data(response)
+        self.assertEqual(data['availabilities-INITIAL_FORMS'], 2)
+        # The second post lacks the page parameter, as after a redirect: the
+        # rows are still matched by their ids.
+        for target, end_time in [(url + '?availabilities_page=2', time(11, 40)), (url, time(11, 45))]:
+            data['availabilities-1-end_time'] = end_time.isoformat()
+            response = self.client.post(target, data)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(
+                list(Availability.objects.filter(tutor=tutor).order_by('start_time').values_list('end_time', flat=True)),
+                [time(hour, 30) for hour in range(11)] + [end_time],
+            )
+
+    def test_estimated_count_only_for_large_unfiltered_tables(self):
+        self.create_tutors(3)
+        paginator = EstimatedCountPaginator(TeacherProfile.objects.order_by('pk'), 10)
+        paginator.threshold = 1
+        self.assertGreaterEqual(paginator.count, 3)
+        paginator = EstimatedCountPaginator(TeacherProfile.objects.filter(verified=True).order_by('pk'), 10)
+        paginator.threshold = 1
+        self.assertEqual(paginator.count, 0)
+
+
+class SyncFeedTestCase(TestCase):
+    """
+    Test suite for the change log and the "changes since cursor" feed.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="junaid", email="junaid@gmail.com")
+        self.subject = Subject.objects.create(name="Physics", subject_code="PHY101")
+
+    def head(self):
+        return changes_since(0)['cursor']
+
+    def test_only_changes_after_cursor_are_returned(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+        cursor = self.head()
+        with self.captureOnCommitCallbacks(execute=True):
+            slot = Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(10, 0))
+            tutor.subject_list.add(self.subject)
+
+        changes = changes_since(cursor)
+        self.assertEqual([t['id'] for t in changes['teacher']['upserts']], [tutor.pk])
+        self.assertEqual(changes['teacher']['upserts'][0]['subject_list'], [self.subject.pk])
+        self.assertEqual([a['id'] for a in changes['availability']['upserts']], [slot.pk])
+        self.assertEqual(changes_since(changes['cursor'])['availability'], {'upserts': [], 'deletes': []})
+
+    def test_changes_are_collapsed_to_latest_operation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+            slot = Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(10, 0))
+        cursor = self.head()
+        with self.captureOnCommitCallbacks(execute=True):
+            for hour in (11, 12, 13):
+                slot.end_time = time(hour, 0)
+                slot.save()
+            slot_id = slot.pk
+            slot.delete()
+
+        changes = changes_since(cursor)
+        self.assertEqual(changes['availability'], {'upserts': [], 'deletes': [slot_id]})
+
+    def test_cursor_follows_commit_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+        cursor = self.head()
+        # A transaction inserts an entry but commits only after a later one.
+        with self.captureOnCommitCallbacks() as slow_commit:
+            early = Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(10, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            late = Availability.objects.create(tutor=tutor, day_of_week='TUE', start_time=time(9, 0), end_time=time(10, 0))
+        # The late commit also numbers the early entry here, which a real
+        # uncommitted transaction would hide; undo that to model it.
+        ChangeLogEntry.objects.filter(kind=ChangeLogEntry.AVAILABILITY, object_id=early.pk).update(sequence=None)
+
+        changes = changes_since(cursor)
+        self.assertEqual([a['id'] for a in changes['availability']['upserts']], [late.pk])
+        for callback in slow_commit:
+            callback()
+        changes = changes_since(changes['cursor'])
+        self.assertEqual([a['id'] for a in changes['availability']['upserts']], [early.pk])
+
+    def test_paging_and_expired_cursor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+            for hour in range(9, 14):
+                Availability.objects.create(tutor=tutor, day_of_week='TUE', start_time=time(hour, 0), end_time=time(hour, 30))
+        page = changes_since(0, limit=2)
+        self.assertTrue(page['has_more'])
+
+        ChangeLogEntry.objects.filter(sequence__lte=3).delete()
+        with self.assertRaises(CursorExpired):
+            changes_since(1)
+
+    def test_pruning_everything_still_expires_old_cursors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+            for hour in range(9, 12):
+                Availability.objects.create(tutor=tutor, day_of_week='TUE', start_time=time(hour, 0), end_time=time(hour, 30))
+        stale_cursor = changes_since(0, limit=1)['cursor']
+        head = self.head()
+        call_command('prune_changelog', '--days', '0', stdout=io.StringIO())
+        self.assertEqual(list(ChangeLogEntry.objects.values_list('sequence', flat=True)), [head])
+        with self.assertRaises(CursorExpired):
+            changes_since(stale_cursor)
+        self.assertEqual(changes_since(head)['cursor'], head)
+
+    def test_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TeacherProfile.objects.create(user=self.user)
+        url = reverse('base:sync_changes')
+        response = self.client.get(url, {'cursor': 0}, headers=auth_headers(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['teacher']['upserts']), 1)
+        response = self.client.get(url, {'cursor': 'x'}, headers=auth_headers(self.user))
+        self.assertEqual(response.status_code, 400)
+
+
+class TaxonomyCacheTestCase(TestCase):
+    """
+    Test suite for the process-local reference data cache.
+    """
+
+    def setUp(self):
+        taxonomy_cache.invalidate()
+        self.medium = Medium.objects.create(name="Bangla")
+        self.grade = Grade.objects.create(name="10th Grade", sequence=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grade.medium.add(self.medium)
+            self.subject = Subject.objects.create(name="Physics", subject_code="PHY101", grade=self.grade)
+
+    def test_snapshot_includes_relations(self):
+        taxonomy = get_taxonomy()
+        self.assertEqual(taxonomy.subjects[self.subject.pk].grade_id, self.grade.pk)
+        self.assertEqual(taxonomy.grades[self.grade.pk].medium_ids, {self.medium.pk})
+        self.assertEqual(taxonomy.subjects_for_grade(self.grade.pk), [taxonomy.subjects[self.subject.pk]])
+
+    def test_serializer_validates_ids_with_one_query_per_field(self):
+        get_taxonomy()
+        serializer = TeacherProfileSerializer()
+        # Unknown ids are rejected by the cache alone; known ones are
+        # confirmed together in one query.
+        with self.assertNumQueries(1):
+            self.assertEqual(serializer.fields['subject_list'].to_internal_value([self.subject.pk]), [self.subject.pk])
+            with self.assertRaises(ValidationError):
+                serializer.fields['medium'].to_internal_value([999])
+
+    def test_id_deleted_before_the_bump_is_a_validation_error(self):
+        get_taxonomy()
+        # Deleted, but this process has not seen the version bump yet.
+        Subject.objects.filter(pk=self.subject.pk).delete()
+        self.assertIn(self.subject.pk, get_taxonomy().subjects)
+        with self.assertRaises(ValidationError):
+            TeacherProfileSerializer().fields['subject_list'].to_internal_value([self.subject.pk])
+
+    def test_admin_edits_invalidate_other_processes(self):
+        version = get_taxonomy().version
+        with self.captureOnCommitCallbacks(execute=True):
+            chemistry = Subject.objects.create(name="Chemistry", grade=self.grade)
+        self.assertGreater(CacheVersion.objects.get(name='taxonomy').version, version)
+        self.assertIn(chemistry.pk, get_taxonomy().subjects)
+
+        # Another worker bumped the stamp: picked up at the next check.
+        get_taxonomy()
+        Medium.objects.bulk_create([Medium(name="English")])
+        CacheVersion.objects.filter(name='taxonomy').update(version=F('version') + 1)
+        taxonomy_cache.invalidate()
+        self.assertIn("English", [medium.name for medium in get_taxonomy().media.values()])
+
+
+class AutocompleteTestCase(TestCase):
+    """
+    Test suite for subject/grade autocomplete.
+    """
+
+    def setUp(self):
+        taxonomy_cache.invalidate()
+        self.grade = Grade.objects.create(name="10th Grade", sequence=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.physics = Subject.objects.create(name="Higher Physics", subject_code="PHY202", grade=self.grade)
+            self.math = Subject.objects.create(name="Mathematics", subject_code="MATH101", grade=self.grade)
+            self.bangla = Subject.objects.create(name="বাংলা", subject_code="BAN101", grade=self.grade)
+
+    def names(self, query, **kwargs):
+        return [suggestion.name for suggestion in autocomplete(query, **kwargs)]
+
+    def test_prefix_of_name_word_and_code(self):
+        self.assertEqual(self.names("MAT"), ["Mathematics"])
+        self.assertEqual(self.names("phy"), ["Higher Physics"])
+        self.assertEqual(self.names("10th", kind='grade'), ["10th Grade"])
+
+    def test_bangla_and_transliteration(self):
+        self.assertEqual(self.names("ফিজিক্স"), ["Higher Physics"])
+        self.assertEqual(self.names("bangla"), ["বাংলা"])
+        self.assertEqual(self.names("বাং"), ["বাংলা"])
+
+    def test_index_is_updated_incrementally(self):
+        self.names("chem")
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name="Chemistry", grade=self.grade)
+            self.math.name = "Statistics"
+            self.math.save()
+        taxonomy_cache.invalidate()
+        self.assertEqual(self.names("chem"), ["Chemistry"])
+        self.assertEqual(self.names("math"), ["Statistics"])  # still found by its code
+        self.assertEqual(self.names("stat"), ["Statistics"])
+
+    def test_ranking_is_not_cut_short_by_many_matches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.bulk_create(Subject(name=f"Gracious Writing {index:03}") for index in range(150))
+            Grade.objects.create(name="Graduate", sequence=16)
+        taxonomy_cache.invalidate()
+        # "graduate" sorts after the 150 "gracious writing" keys.
+        self.assertEqual(self.names("gra", kind='grade'), ["Graduate", "10th Grade"])
+        self.assertEqual(self.names("gra", limit=2), ["Graduate", "Gracious Writing 000"])
+
+    def test_phonetic_key_does_not_match_names(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name="Finance", grade=self.grade)
+        taxonomy_cache.invalidate()
+        # "phy" sounds like "fi", but that is only a phonetic match for Finance.
+        self.assertEqual(self.names("phy", limit=1), ["Higher Physics"])
+        self.assertEqual(self.names("phy"), ["Higher Physics", "Finance"])
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('base:autocomplete'), {'q': 'phy', 'type': 'subject'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], self.physics.pk)
+
+
+def next_weekday(code):
+    """The next date (from tomorrow on) falling on the day `code`, e.g. 'MON'."""
+    day = date.today() + timedelta(days=1)
+    while day.strftime('%a').upper() != code:
+        day += timedelta(days=1)
+    return day
+
+
+class BookingTestCase(TestCase):
+    """
+    Test suite for booking tutor slots.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.tutor = TeacherProfile.objects.create(
+            user=User.objects.create_user(username="tutor", email="tutor@gmail.com")
+        )
+        self.student = User.objects.create_user(username="student", email="student@gmail.com")
+        Availability.objects.create(tutor=self.tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(12, 0))
+        self.monday = next_weekday('MON')
+
+    def test_overlaps_are_rejected(self):
+        book_slot(self.tutor.pk, self.student, self.monday, time(9, 0), time(10, 0))
+        other = get_user_model().objects.create_user(username="other", email="other@gmail.com")
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.tutor.pk, other, self.monday, time(9, 30), time(10, 30))
+        # Back-to-back is fine.
+        book_slot(self.tutor.pk, other, self.monday, time(10, 0), time(11, 0))
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.tutor.pk, self.student, self.monday, time(11, 30), time(12, 30))
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.tutor.pk, self.student, next_weekday('TUE'), time(9, 0), time(10, 0))
+        # Rejected attempts roll back their version bump.
+        self.assertEqual(TeacherProfile.objects.get(pk=self.tutor.pk).booking_version, 2)
+
+    def test_endpoints(self):
+        url = reverse('base:bookings')
+        payload = {'tutor': self.tutor.pk, 'date': self.monday.isoformat(), 'start_time': '09:00', 'end_time': '10:00'}
+        response = self.client.post(url, payload, format='json', headers=auth_headers(self.student))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post(url, payload, headers=auth_headers(self.student)).status_code, 409)
+
+        response = self.client.get(url, headers=auth_headers(self.tutor.user))
+        self.assertEqual([booking['student'] for booking in response.data], [self.student.pk])
+
+        cancel_url = reverse('base:cancel_booking', args=[response.data[0]['id']])
+        self.assertEqual(self.client.post(cancel_url, headers=auth_headers(self.student)).status_code, 200)
+        self.assertEqual(self.client.post(cancel_url, headers=auth_headers(self.student)).status_code, 409)
+        # The cancelled slot can be booked again.
+        self.assertEqual(self.client.post(url, payload, headers=auth_headers(self.student)).status_code, 201)
+
+
+class BookingConcurrencyTestCase(TransactionTestCase):
+    """
+    Many students booking overlapping slots of one tutor at the same time
+    must end up with no double booking.
+    """
+
+    def test_no_double_booking_under_contention(self):
+        User = get_user_model()
+        tutor = TeacherProfile.objects.create(user=User.objects.create_user(username="tutor", email="tutor@gmail.com"))
+        Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(8, 0), end_time=time(12, 0))
+        students = [User.objects.create_user(username=f"student{i}", email=f"student{i}@gmail.com") for i in range(8)]
+        monday = next_weekday('MON')
+        barrier = threading.Barrier(len(students))
+        outcomes = []
+
+        def attempt(student, index):
+            try:
+                barrier.wait()
+                for hour in range(8, 12):
+                    # Half-hour offsets make every request overlap two others.
+                    start = time(hour, 30 if index % 2 else 0)
+                    end = time(hour + 1, 30 if index % 2 else 0) if hour < 11 or not index % 2 else time(12, 0)
+                    try:
+                        book_slot(tutor.pk, student, monday, start, end)
+                        outcomes.append('booked')
+                    except SlotUnavailable:
+                        outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(s, i)) for i, s in enumerate(students)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), len(students) * 4)
+        booked = list(Booking.objects.filter(tutor=tutor).order_by('start_time').values_list('start_time', 'end_time'))
+        self.assertEqual(outcomes.count('booked'), len(booked))
+        for (_, previous_end), (start, _) in zip(booked, booked[1:]):
+            self.assertLessEqual(previous_end, start)
+
+    def test_student_cannot_book_two_tutors_at_once(self):
+        User = get_user_model()
+        tutors = []
+        for index in range(4):
+            tutor = TeacherProfile.objects.create(user=User.objects.create_user(username=f"tutor{index}", email=f"tutor{index}@gmail.com"))
+            Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(8, 0), end_time=time(12, 0))
+            tutors.append(tutor)
+        student = User.objects.create_user(username="student", email="student@gmail.com")
+        monday = next_weekday('MON')
+        barrier = threading.Barrier(len(tutors))
+        outcomes = []
+
+        def attempt(tutor):
+            try:
+                barrier.wait()
+                try:
+                    book_slot(tutor.pk, student, monday, time(9, 0), time(10, 0))
+                    outcomes.append('booked')
+                except SlotUnavailable:
+                    outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(tutor,)) for tutor in tutors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['booked'] + ['rejected'] * (len(tutors) - 1))
+        self.assertEqual(Booking.objects.filter(student=student).count(), 1)
+
+
+@override_settings(CALENDAR_HORIZON_DAYS=28)
+class CalendarTestCase(TestCase):
+    """
+    Test suite for the materialized availability calendar.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.tutor = TeacherProfile.objects.create(
+            user=User.objects.create_user(username="tutor", email="tutor@gmail.com")
+        )
+        self.student = User.objects.create_user(username="student", email="student@gmail.com")
+        self.slot = Availability.objects.create(tutor=self.tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(12, 0))
+
+    def dates(self):
+        return list(CalendarSlot.objects.filter(tutor=self.tutor).values_list('date', flat=True))
+
+    def test_slots_follow_availability_changes(self):
+        self.assertEqual(len(self.dates()), 4)
+        self.assertEqual({day.strftime('%a') for day in self.dates()}, {'Mon'})
+        self.slot.day_of_week = 'TUE'
+        self.slot.save()
+        self.assertEqual({day.strftime('%a') for day in self.dates()}, {'Tue'})
+        self.slot.delete()
+        self.assertEqual(self.dates(), [])
+
+    def test_extend_moves_the_window(self):
+        today = timezone.localdate()
+        created, deleted = extend_calendar(today=today + timedelta(days=7))
+        # Any seven days hold exactly one Monday: one slot leaves, one joins.
+        self.assertEqual((created, deleted), (1, 1))
+        self.assertEqual(len(self.dates()), 4)
+        self.assertEqual(extend_calendar(today=today + timedelta(days=7)), (0, 0))
+
+    def test_free_slots_subtract_bookings(self):
+        monday = next_weekday('MON')
+        book_slot(self.tutor.pk, self.student, monday, time(10, 0), time(11, 0))
+        slots = [(slot.start_time, slot.end_time) for slot in free_slots(self.tutor.pk, monday, monday)]
+        self.assertEqual(slots, [(time(9, 0), time(10, 0)), (time(11, 0), time(12, 0))])
+
+    def test_endpoints(self):
+        monday = next_weekday('MON')
+        book_slot(self.tutor.pk, self.student, monday, time(9, 0), time(10, 0))
+        url = reverse('base:free_slots', args=[self.tutor.pk])
+        response = self.client.get(url, {'start': monday.isoformat(), 'end': monday.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['slots'], [{'date': monday, 'start_time': time(10, 0), 'end_time': time(12, 0)}])
+        far = monday + timedelta(days=60)
+        self.assertEqual(self.client.get(url, {'end': far.isoformat()}).status_code, 400)
+
+        url = reverse('base:tutor_calendar', args=[self.tutor.pk])
+        public = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertIn(f"DTSTART:{monday:%Y%m%d}T100000", public)
+        self.assertNotIn("Lesson with", public)
+        own = b''.join(self.client.get(url, headers=auth_headers(self.tutor.user)).streaming_content).decode()
+        self.assertTrue(own.startswith("BEGIN:VCALENDAR\r\n") and own.endswith("END:VCALENDAR\r\n"))
+        self.assertIn("SUMMARY:Lesson with student", own)
+
+    def test_ical_uids_are_unique_for_overlapping_availability(self):
+        Availability.objects.create(tutor=self.tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(10, 0))
+        url = reverse('base:tutor_calendar', args=[self.tutor.pk])
+        uids = [line for line in b''.join(self.client.get(url).streaming_content).decode().splitlines()
+                if line.startswith('UID:')]
+        self.assertEqual(len(uids), 8)
+        self.assertEqual(len(set(uids)), 8)
+
+
+@override_settings(SUPPLY_HEATMAP={'MIN_ZOOM': 10, 'MAX_ZOOM': 12, 'TILE_DETAIL': 1})
+class SupplyHeatmapTestCase(TestCase):
+    """
+    Test suite for the incrementally maintained tutor supply heatmap.
+    """
+    DHAKA = "23.8103,90.4125,10"
+    CHITTAGONG = "22.3569,91.7832,10"
+
+    def setUp(self):
+        self.physics = Subject.objects.create(name="Physics", subject_code="PHY101")
+        self.online = TeachingMode.objects.create(name="Online")
+
+    def create_tutor(self, username, location):
+        User = get_user_model()
+        user = User.objects.create_user(username=username, email=f"{username}@gmail.com", location=location)
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=user)
+        Worker().run_pending()  # the queued refresh_tutor_indexes job
+        return tutor
+
+    def count(self, location, zoom=12, subject=0, teaching_mode=0):
+        x, y = supply.tile_for(*supply.parse_location(location), zoom)
+        cell = SupplyCell.objects.filter(zoom=zoom, x=x, y=y, subject=subject, teaching_mode=teaching_mode).first()
+        return cell.count if cell else 0
+
+    def snapshot(self):
+        return sorted(SupplyCell.objects.values_list('zoom', 'x', 'y', 'subject', 'teaching_mode', 'count'))
+
+    def test_cells_follow_tutor_changes(self):
+        first = self.create_tutor("first", self.DHAKA)
+        second = self.create_tutor("second", self.DHAKA)
+        self.assertEqual(self.count(self.DHAKA), 2)
+        self.assertEqual(self.count(self.DHAKA, zoom=10), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.subject_list.add(self.physics)
+            first.teaching_mode.add(self.online)
+        self.assertEqual(self.count(self.DHAKA, subject=self.physics.pk), 1)
+        self.assertEqual(self.count(self.DHAKA, subject=self.physics.pk, teaching_mode=self.online.pk), 1)
+        self.assertEqual(self.count(self.DHAKA), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.user.location = self.CHITTAGONG
+            second.user.save()
+        self.assertEqual((self.count(self.DHAKA), self.count(self.CHITTAGONG)), (1, 1))
+
+        first.delete()
+        self.assertEqual(self.count(self.DHAKA), 0)
+        self.assertEqual(self.count(self.DHAKA, subject=self.physics.pk), 0)
+
+        incremental = self.snapshot()
+        supply.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_endpoints(self):
+        self.create_tutor("tutor", self.DHAKA)
+        admin = get_user_model().objects.create_user(username="admin", email="admin@gmail.com", is_staff=True)
+        response = self.client.get(
+            reverse('base:supply_heatmap'), {'zoom': 12, 'bbox': '90,23,91,24'}, headers=auth_headers(admin)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cell['count'] for cell in response.data['cells']], [1])
+        west, south, east, north = response.data['cells'][0]['bounds']
+        self.assertTrue(west <= 90.4125 <= east and south <= 23.8103 <= north)
+
+        x, y = supply.tile_for(23.8103, 90.4125, 10)
+        response = self.client.get(reverse('base:supply_tile', args=[10, x, y]), headers=auth_headers(admin))
+        self.assertEqual(response.data['zoom'], 11)
+        self.assertEqual(len(response.data['cells']), 1)
+        response = self.client.get(reverse('base:supply_tile', args=[10, x, y]), headers=auth_headers(get_user_model().objects.get(username="tutor")))
+        self.assertEqual(response.status_code, 403)
+
+
+class TutorExportTestCase(TestCase):
+    """
+    Test suite for the streaming NDJSON directory export.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        physics = Subject.objects.create(name="Physics", subject_code="PHY101")
+        for index in range(5):
+            tutor = TeacherProfile.objects.create(
+                user=User.objects.create_user(username=f"tutor{index}", email=f"tutor{index}@gmail.com")
+            )
+            tutor.subject_list.add(physics)
+            Availability.objects.create(tutor=tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(10, 0))
+        self.admin = User.objects.create_user(username="admin", email="admin@gmail.com", is_staff=True)
+
+    def test_chunks_are_prefetched(self):
+        with capture_queries() as stats:
+            lines = b''.join(iter_tutors(chunk_size=2)).decode().splitlines()
+        # Three chunks of (profiles + four prefetches), plus the final empty page.
+        self.assertEqual(stats.count, 3 * 5 + 1)
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['availability'][0]['day_of_week'], 'MON')
+        self.assertEqual(len(records[0]['subject_list']), 1)
+        self.assertNotIn('booking_version', records[0])
+
+    def test_accepts_gzip(self):
+        for header, expected in [
+            ('gzip', True), ('gzip, deflate, br', True), ('br;q=1.0, gzip;q=0.5', True), ('*', True),
+            ('', False), ('br', False), ('gzip;q=0', False), ('gzip;q=0.0, *;q=1', False), ('*;q=0', False),
+        ]:
+            self.assertEqual(accepts_gzip(header), expected, header)
+
+    def test_endpoint_and_command(self):
+        url = reverse('base:export_tutors')
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip', **auth_headers(self.admin)})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 5)
+        response = self.client.get(url, headers={'Accept-Encoding': 'br, gzip;q=0', **auth_headers(self.admin)})
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+        tutor = TeacherProfile.objects.first().user
+        self.assertEqual(self.client.get(url, headers=auth_headers(tutor)).status_code, 403)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tutors.ndjson.gz')
+            call_command('export_tutors', output=path, chunk_size=2, stderr=io.StringIO())
+            with gzip.open(path) as exported:
+                self.assertEqual(len(exported.read().splitlines()), 5)
+
+
+@skipIf(msgpack is None, "msgpack is not installed")
+class MessagePackRendererTestCase(TestCase):
+    """
+    Test suite for the compact MessagePack response format.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.tutor = TeacherProfile.objects.create(
+            user=User.objects.create_user(username="tutor", email="tutor@gmail.com")
+        )
+        self.student = User.objects.create_user(username="student", email="student@gmail.com")
+        Availability.objects.create(tutor=self.tutor, day_of_week='MON', start_time=time(9, 0), end_time=time(12, 0))
+        self.monday = next_weekday('MON')
+
+    def test_times_are_minute_offsets_only_in_msgpack(self):
+        url = reverse('base:bookings')
+        payload = {'tutor': self.tutor.pk, 'date': self.monday.isoformat(), 'start_time': 540, 'end_time': 600}
+        response = self.client.post(url, payload, content_type='application/json', headers=auth_headers(self.student))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['start_time'], '09:00:00')
+
+        response = self.client.get(url, headers={'Accept': 'application/msgpack', **auth_headers(self.student)})
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        [booking] = msgpack.unpackb(response.content)
+        self.assertEqual((booking['start_time'], booking['end_time']), (540, 600))
+        self.assertEqual(booking['date'], self.monday.isoformat())
+
+    def test_plain_values_and_errors(self):
+        headers = {'Accept': 'application/msgpack', **auth_headers(self.student)}
+        url = reverse('base:free_slots', args=[self.tutor.pk])
+        response = self.client.get(url, {'start': self.monday.isoformat(), 'end': self.monday.isoformat()}, headers=headers)
+        self.assertEqual(msgpack.unpackb(response.content)['slots'][0]['start_time'], 540)
+        response = self.client.get(url, {'start': 'soon'}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', msgpack.unpackb(response.content))
+
+    def test_sync_feed(self):
+        assign_sequences()  # setUp's changes count as committed
+        headers = {'Accept': 'application/msgpack', **auth_headers(self.student)}
+        changes = msgpack.unpackb(self.client.get(reverse('base:sync_changes'), headers=headers).content)
+        [slot] = changes['availability']['upserts']
+        self.assertEqual((slot['start_time'], slot['end_time']), (540, 720))
+        [tutor] = changes['teacher']['upserts']
+        self.assertEqual(tutor['availability'][0]['start_time'], 540)
+
+
+@override_settings(LOCATION_INGEST={'BACKGROUND': False, 'MAX_PENDING': 100})
+class LocationIngestTestCase(TestCase):
+    """
+    Test suite for set_location jitter filtering and write coalescing.
+    """
+    DHAKA = "23.8103,90.4125,10"
+    NEARBY = "23.8104,90.4126,12"
+    MIRPUR = "23.8223,90.3654,10"
+    UTTARA = "23.8759,90.3795,10"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="tutor", email="tutor@gmail.com")
+        self.url = reverse('base:set_location')
+        self.addCleanup(location_buffer.flush)
+
+    def post(self, location, **data):
+        return self.client.post(self.url, {'location': location, **data}, format='json', headers=auth_headers(self.user))
+
+    def stored(self):
+        return get_user_model().objects.values_list('location', flat=True).get(pk=self.user.pk)
+
+    def test_first_location_jitter_and_confirmation(self):
+        self.assertEqual(self.post(self.DHAKA).data['detail'], "Location updated successfully.")
+        self.assertEqual(self.stored(), self.DHAKA)
+        self.assertNotIn('update_required', self.post(self.NEARBY).data)
+        self.assertTrue(self.post(self.MIRPUR).data['update_required'])
+        self.assertEqual(self.post("somewhere").status_code, 400)
+        self.assertEqual(self.stored(), self.DHAKA)
+
+    def test_confirmed_moves_are_coalesced(self):
+        self.user.location = self.DHAKA
+        self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            tutor = TeacherProfile.objects.create(user=self.user)
+        self.post(self.MIRPUR, update=True)
+        self.post(self.UTTARA, update=True)
+        # Still buffered; the second fix replaced the first.
+        self.assertEqual(self.stored(), self.DHAKA)
+        self.assertEqual(location_buffer.latest(self.user.pk), self.UTTARA)
+
+        with capture_queries(record=True) as stats:
+            self.assertEqual(location_buffer.flush(), 1)
+        self.assertEqual(self.stored(), self.UTTARA)
+        user_writes = [sql for sql in stats.statements if sql.startswith('UPDATE "base_customuser"')]
+        self.assertEqual(len(user_writes), 1)
+        self.assertNotIn('"password"', user_writes[0])
+        # The heatmap followed the bulk write.
+        self.assertEqual(tutor.supply_footprint.x, supply.tile_for(23.8759, 90.3795, supply.get_config()['MAX_ZOOM'])[0])
+
+
+class TokenCacheTestCase(TestCase):
+    """
+    Test suite for the validated-claims cache and refresh deduplication.
+    """
+
+    def setUp(self):
+        claims_cache.clear()
+        refresh_flight.clear()
+        self.user = get_user_model().objects.create_user(username="junaid", email="junaid@gmail.com")
+
+    def test_claims_are_cached_until_expiry(self):
+        access = RefreshToken.for_user(self.user).access_token
+        url = reverse('base:protected_view')
+        self.assertEqual(self.client.get(url, headers={"Authorization": f"Bearer {access}"}).status_code, 200)
+        self.assertIsNotNone(claims_cache.get(token_digest(str(access))))
+        self.assertEqual(self.client.get(url, headers={"Authorization": f"Bearer {access}"}).status_code, 200)
+        # A forged signature never matches a cached digest.
+        self.assertEqual(self.client.get(url, headers={"Authorization": f"Bearer {access}x"}).status_code, 401)
+
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        claims_cache.set(b'expired', expired)
+        self.assertIsNone(claims_cache.get(b'expired'))
+
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        computed = []
+        results = []
+
+        def compute():
+            computed.append(1)
+            threading.Event().wait(0.05)
+            return {'access': 'token'}
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 7)
+
+    def test_refresh_endpoint(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        url = reverse('token_refresh')
+        first = self.client.post(url, {'refresh': refresh}, content_type='application/json')
+        second = self.client.post(url, {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.client.post(url, {'refresh': 'garbage'}, content_type='application/json').status_code, 401)
+        self.assertEqual(self.client.post(url, {}, content_type='application/json').status_code, 400)
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'write': '100/min', 'base:set_location': '2/min', 'token_refresh': '2/min'},
+    },
+)
+class ThrottleTestCase(TestCase):
+    """
+    Test suite for the token bucket throttle on write endpoints.
+    """
+
+    def setUp(self):
+        self.state_file = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'throttle.bin')
+        self.enterContext(override_settings(THROTTLE_STATE={'FILE': self.state_file, 'SLOTS': 64}))
+        User = get_user_model()
+        self.first = User.objects.create_user(username="first", email="first@gmail.com")
+        self.second = User.objects.create_user(username="second", email="second@gmail.com")
+        self.url = reverse('base:set_location')
+        self.addCleanup(location_buffer.flush)
+
+    def post(self, user):
+        return self.client.post(self.url, {'location': "23.8103,90.4125,10"}, format='json', headers=auth_headers(user))
+
+    def test_buckets_per_user_and_endpoint(self):
+        self.assertEqual([self.post(self.first).status_code for _ in range(3)], [200, 200, 429])
+        response = self.post(self.first)
+        self.assertEqual(int(response['Retry-After']), 30)
+        # Other users and other endpoints have their own buckets.
+        self.assertEqual(self.post(self.second).status_code, 200)
+        self.assertEqual(self.client.post(reverse('base:bookings'), {}, headers=auth_headers(self.first)).status_code, 400)
+        # Reads are never throttled.
+        self.assertEqual(self.client.get(reverse('base:protected_view'), headers=auth_headers(self.first)).status_code, 200)
+
+    def test_unavailable_state_lets_requests_through(self):
+        self.enterContext(mock.patch.object(TokenBucketThrottle, '_last_warning', 0.0))
+        with mock.patch('base.throttling.get_table', side_effect=OSError("read-only file system")):
+            with self.assertLogs('base.throttling', 'WARNING'):
+                self.assertEqual([self.post(self.first).status_code for _ in range(3)], [200, 200, 200])
+
+    def test_state_is_shared_through_the_file(self):
+        # A second mapping of the file stands in for another worker process.
+        self.assertEqual([self.post(self.first).status_code for _ in range(2)], [200, 200])
+        other = BucketTable(self.state_file, 64)
+        index, fingerprint, full_at = other.slot_for(f"base:set_location:user:{self.first.pk}", 0)
+        self.assertIsNotNone(full_at)
+        other.write(index, fingerprint, 0.0)
+        self.assertEqual(self.post(self.first).status_code, 200)
+
+    def test_token_refresh_is_keyed_by_refresh_token(self):
+        url = reverse('token_refresh')
+        first, second = (str(RefreshToken.for_user(user)) for user in (self.first, self.second))
+        # Both come from the test client's address, like users behind one NAT.
+        def refresh(token):
+            return self.client.post(url, {'refresh': token}, content_type='application/json').status_code
+
+        self.assertEqual([refresh(first) for _ in range(3)], [200, 200, 429])
+        self.assertEqual(refresh(second), 200)
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_forwarded_for_is_only_believed_from_trusted_proxies(self):
+        factory = RequestFactory()
+        spoofed = factory.post('/', REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='198.51.100.1')
+        self.assertEqual(client_ip(spoofed), '203.0.113.9')
+        proxied = factory.post('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.2.3.4, 198.51.100.7, 10.0.0.1')
+        self.assertEqual(client_ip(proxied), '198.51.100.7')
+
+
+class EligibilityTestCase(TestCase):
+    """
+    Test suite for the precomputed is_searchable / completeness_score flags.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.physics = Subject.objects.create(name="Physics", subject_code="PHY101")
+        user = User.objects.create_user(username="tutor", email="tutor@gmail.com", location="23.8103,90.4125,10")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor = TeacherProfile.objects.create(user=user, verified=True)
+        Worker().run_pending()
+
+    def flags(self):
+        return TeacherProfile.objects.filter(pk=self.tutor.pk).values_list('is_searchable', 'completeness_score').get()
+
+    def complete_profile(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor.subject_list.add(self.physics)
+            Availability.objects.create(tutor=self.tutor, day_of_week='MON', start_time=time(9), end_time=time(12))
+            AcademicProfile.objects.create(teacher=self.tutor, institution="Dhaka University")
+
+    def test_flags_follow_profile_changes(self):
+        self.assertEqual(self.flags(), (False, 14))
+        self.complete_profile()
+        self.assertEqual(self.flags(), (True, 57))
+        self.assertEqual(find_available_tutors('MON', time(10), time(11), eligible_only=True), [self.tutor])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor.user.banned = True
+            self.tutor.user.save()
+        self.assertEqual(self.flags(), (False, 57))
+        self.assertEqual(find_available_tutors('MON', time(10), time(11), eligible_only=True), [])
+        self.assertEqual(find_available_tutors('MON', time(10), time(11)), [self.tutor])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor.user.banned = False
+            self.tutor.user.save(update_fields=['banned'])
+            self.physics.delete()
+        self.assertEqual(self.flags(), (False, 43))
+
+    def test_new_tutor_is_indexed_by_a_queued_job(self):
+        User = get_user_model()
+        user = User.objects.create_user(username="newtutor", email="newtutor@gmail.com", location="23.8103,90.4125,10")
+        response = self.client.post(reverse('base:create_teacher'), {'verified': True}, headers=auth_headers(user))
+        self.assertEqual(response.status_code, 201)
+        tutor = TeacherProfile.objects.get(user=user)
+        job = Job.objects.get(idempotency_key=f"tutor-created:{tutor.pk}")
+        self.assertEqual((job.task, job.status), ('base.tasks.refresh_tutor_indexes', Job.QUEUED))
+        # Same place as self.tutor, whose cells count 1 until the job runs.
+        cells = SupplyCell.objects.filter(zoom=12, subject=0, teaching_mode=0)
+        self.assertEqual((tutor.completeness_score, cells.get().count), (0, 1))
+
+        self.assertEqual(Worker().run_pending(), 1)
+        tutor.refresh_from_db()
+        self.assertEqual((tutor.completeness_score, cells.get().count), (14, 2))
+
+    def test_admin_actions_refresh_flags(self):
+        self.complete_profile()
+        admin = mock.Mock()
+        ban_teachers(admin, None, TeacherProfile.objects.all())
+        self.assertEqual(self.flags(), (False, 57))
+        TeacherProfile.objects.update(verified=False)
+        get_user_model().objects.update(banned=False)
+        verify_teachers(admin, None, TeacherProfile.objects.all())
+        self.assertEqual(self.flags(), (True, 57))
+
+    def test_check_finds_and_fixes_drift(self):
+        self.complete_profile()
+        # Bulk writes that bypass the signals leave the flags stale.
+        TeacherProfile.objects.update(verified=False, bio="Physics tutor")
+        out = io.StringIO()
+        call_command('check_eligibility', stdout=out)
+        self.assertIn("Found 1 tutors", out.getvalue())
+        self.assertEqual(self.flags(), (True, 57))
+        call_command('check_eligibility', '--fix', stdout=io.StringIO())
+        self.assertEqual(self.flags(), (False, 71))
+        self.assertEqual(eligibility.check(), [])
+
+    def test_migration_computes_flags_with_historical_models(self):
+        self.complete_profile()
+        TeacherProfile.objects.update(is_searchable=False, completeness_score=0)
+        state = MigrationLoader(connection).project_state(('base', '0016_eligibility'))
+        migration = importlib.import_module('base.migrations.0016_eligibility')
+        migration.compute_flags(state.apps, None)
+        self.assertEqual(self.flags(), (True, 57))
+        self.assertEqual(eligibility.check(), [])
+
+    def test_search_returns_searchable_tutors_most_complete_first(self):
+        self.complete_profile()
+        User = get_user_model()
+        user = User.objects.create_user(username="tutor2", email="tutor2@gmail.com", location="23.8103,90.4125,10")
+        with self.captureOnCommitCallbacks(execute=True):
+            other = TeacherProfile.objects.create(user=user, verified=True, bio="Physics tutor")
+            other.subject_list.add(self.physics)
+            Availability.objects.create(tutor=other, day_of_week='MON', start_time=time(8), end_time=time(12))
+            AcademicProfile.objects.create(teacher=other, institution="BUET")
+            hidden = TeacherProfile.objects.create(
+                user=User.objects.create_user(username="tutor3", email="tutor3@gmail.com"), verified=True,
+            )
+            Availability.objects.create(tutor=hidden, day_of_week='MON', start_time=time(9), end_time=time(12))
+
+        response = self.client.get(reverse('base:tutor_search'), {'day': 'MON', 'start': '10:00', 'end': '11:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([tutor['id'] for tutor in response.data['results']], [other.pk, self.tutor.pk])
+        response = self.client.get(reverse('base:tutor_search'), {'day': 'MON', 'start': '11:00', 'end': '10:00'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,232 @@
+import hashlib
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATE_DEFAULTS = {
+    # Memory-mapped file holding the buckets of every worker process on
+    # this host. None keeps the buckets in (per-process) anonymous memory.
+    'FILE': None,
+    # Number of bucket slots; idle buckets are reused, so this bounds the
+    # number of clients throttled at the same moment, not in total.
+    'SLOTS': 65536,
+}
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# Methods that never consume tokens.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Rate key used for write endpoints without a rate of their own.
+DEFAULT_SCOPE = 'write'
+
+# Slots inspected for a key before it shares a slot with another key.
+PROBES = 4
+
+# Scopes whose buckets are keyed by a digest of a request field instead of
+# the caller: many users behind one NAT share an IP, each with their own
+# refresh token.
+TOKEN_KEYED_SCOPES = {'token_refresh': 'refresh'}
+
+
+def get_config():
+    config = dict(THROTTLE_STATE_DEFAULTS)
+    config.update(getattr(settings, 'THROTTLE_STATE', {}))
+    return config
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(proxies):
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _is_trusted(address):
+    try:
+        address = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    networks = _trusted_networks(tuple(getattr(settings, 'THROTTLE_TRUSTED_PROXIES', ())))
+    return any(address in network for network in networks)
+
+
+def client_ip(request):
+    """
+    The caller's address. X-Forwarded-For is only believed when the request
+    comes from a proxy in settings.THROTTLE_TRUSTED_PROXIES (addresses or
+    networks); its entries are read right to left, skipping further trusted
+    proxies, since anything left of them is whatever the client sent.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if not forwarded or not _is_trusted(address):
+        return address
+    for hop in reversed(forwarded.split(',')):
+        address = hop.strip()
+        if not _is_trusted(address):
+            break
+    return address
+
+
+def parse_rate(rate):
+    """Parses "<requests>/<period>" (e.g. "30/min") into (requests, seconds)."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+class BucketTable:
+    """
+    Fixed-size open-addressing table of (key fingerprint, value) slots in
+    shared memory. With a file, the mapping is shared by every process that
+    opens it (and survives forking), so all workers see the same buckets.
+    Slot reads and writes are not locked across processes: a race between
+    two processes can at worst admit one extra request.
+    """
+    SLOT = struct.Struct('<Qd')
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        size = slots * self.SLOT.size
+        if path is None:
+            self._map = mmap.mmap(-1, size)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def fingerprint(key):
+        # Never 0, which marks an empty slot.
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+
+    def slot_for(self, key, now):
+        """Index of the slot holding `key`, or of the one it should take."""
+        fingerprint = self.fingerprint(key)
+        free = None
+        for probe in range(PROBES):
+            index = (fingerprint + probe) % self.slots
+            stored, value = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+            if stored == fingerprint:
+                return index, fingerprint, value
+            if free is None and (stored == 0 or value <= now):
+                free = index
+        if free is None:
+            free = fingerprint % self.slots
+        return free, fingerprint, None
+
+    def write(self, index, fingerprint, value):
+        self.SLOT.pack_into(self._map, index * self.SLOT.size, fingerprint, value)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table():
+    config = get_config()
+    path = str(config['FILE']) if config['FILE'] else None
+    key = (path, config['SLOTS'])
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = _tables[key] = BucketTable(path, config['SLOTS'])
+    return table
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per user (or client IP for anonymous requests) and endpoint
+    for write requests. Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    keyed by URL name (e.g. "base:set_location"), falling back to "write".
+    A rate of "30/min" allows bursts of 30 requests refilled at one every
+    two seconds. Anonymous callers are keyed by client_ip(), token refresh
+    by the refresh token (TOKEN_KEYED_SCOPES).
+
+    Buckets are stored in their GCRA form, a single timestamp (the time the
+    bucket will be full again), in the shared BucketTable: a check is a
+    hash and a few fixed-offset memory reads. Requests are let through when
+    the table cannot be used.
+    """
+    _lock = threading.Lock()
+    _last_warning = 0.0
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_scope(self, request, view):
+        match = request.resolver_match
+        return match.view_name if match is not None else view.__class__.__name__
+
+    def get_rate(self, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        return parse_rate(rates.get(scope, rates.get(DEFAULT_SCOPE)))
+
+    def get_key(self, request, scope):
+        field = TOKEN_KEYED_SCOPES.get(scope)
+        token = request.data.get(field) if field and isinstance(request.data, dict) else None
+        if isinstance(token, str) and token:
+            ident = f"token:{hashlib.sha256(token.encode()).hexdigest()}"
+        elif request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"{scope}:{ident}"
+
+    def get_ident(self, request):
+        return client_ip(request)
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        scope = self.get_scope(request, view)
+        rate = self.get_rate(scope)
+        if rate is None:
+            return True
+        requests, period = rate
+        interval = period / requests
+        key = self.get_key(request, scope)
+        try:
+            table = get_table()
+            with self._lock:
+                now = time.time()
+                index, fingerprint, full_at = table.slot_for(key, now)
+                full_at = max(full_at or now, now)
+                # Admit while the bucket still holds one token, i.e. it
+                # would be full again within the period minus one interval.
+                if full_at - now > period - interval:
+                    self.retry_after = full_at - now - (period - interval)
+                    return False
+                table.write(index, fingerprint, full_at + interval)
+        except (OSError, ValueError):
+            self._warn_unavailable()
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+    @classmethod
+    def _warn_unavailable(cls):
+        now = time.monotonic()
+        if now - cls._last_warning > 60:
+            cls._last_warning = now
+            logger.warning("Throttle state unavailable, letting requests through", exc_info=True)
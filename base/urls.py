@@ -1,11 +1,23 @@
 from django.urls import path
-from .views import home, protected_view, set_location, create_teacher
+from .views import home, protected_view, metrics, set_location, create_teacher, certificate_download, sync_changes, autocomplete, bookings, cancel_booking, tutor_search, free_slots, tutor_calendar, supply_heatmap, supply_tile, export_tutors
 
 app_name = 'base'
 
 urlpatterns = [
     path('', home, name='home'),
     path('protected/', protected_view, name='protected_view'),
+    path('metrics/', metrics, name='metrics'),
     path('set-location/', set_location, name='set_location'),
     path('teacher/create/', create_teacher, name='create_teacher'),
+    path('certificates/<str:kind>/<int:pk>/', certificate_download, name='certificate_download'),
+    path('sync/changes/', sync_changes, name='sync_changes'),
+    path('autocomplete/', autocomplete, name='autocomplete'),
+    path('bookings/', bookings, name='bookings'),
+    path('bookings/<int:pk>/cancel/', cancel_booking, name='cancel_booking'),
+    path('tutors/search/', tutor_search, name='tutor_search'),
+    path('tutors/<int:pk>/free-slots/', free_slots, name='free_slots'),
+    path('tutors/<int:pk>/calendar.ics', tutor_calendar, name='tutor_calendar'),
+    path('supply/heatmap/', supply_heatmap, name='supply_heatmap'),
+    path('supply/tiles/<int:zoom>/<int:x>/<int:y>/', supply_tile, name='supply_tile'),
+    path('export/tutors.ndjson', export_tutors, name='export_tutors'),
 ]
\ No newline at end of file
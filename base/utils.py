@@ -1,11 +1,14 @@
 from math import radians, sin, cos, sqrt, atan2
 
 from datetime import time
+
+from django.db.models import Exists, OuterRef
 from .models import Availability, TeacherProfile # Assuming models.py is in the same app
 
 def calculate_distance(loc1, loc2):
-    lat1, lon1, accu1 = map(float, loc1.split(","))
-    lat2, lon2, accu1 = map(float, loc2.split(","))
+    # "lat,lon,accuracy"; the accuracy is not needed here.
+    lat1, lon1 = map(float, loc1.split(",")[:2])
+    lat2, lon2 = map(float, loc2.split(",")[:2])
     R = 6371  # Earth radius in km
     dlat = radians(lat2 - lat1)
     dlon = radians(lon2 - lon1)
@@ -17,7 +20,8 @@ def calculate_distance(loc1, loc2):
 
 
 
-def find_available_tutors(day_of_week: str, desired_start_time: time, desired_end_time: time) -> list[TeacherProfile]:
+def find_available_tutors(day_of_week: str, desired_start_time: time, desired_end_time: time,
+                          eligible_only: bool = False) -> list[TeacherProfile]:
     """
     Finds tutors who are available for the entire specified time range on a given day.
 
@@ -26,35 +30,32 @@ def find_available_tutors(day_of_week: str, desired_start_time: time, desired_en
                            Must match the choices defined in Availability.DAY_CHOICES.
         desired_start_time (datetime.time): The start time of the desired booking slot.
         desired_end_time (datetime.time): The end time of the desired booking slot.
+        eligible_only (bool): Only return tutors that may appear in search
+                              (TeacherProfile.is_searchable); the search
+                              view always passes True.
 
     Returns:
         list[Tutor]: A list of Tutor objects who are available for the entire
-                     specified duration on the given day.
+                     specified duration on the given day, most complete
+                     profiles first.
     """
     # Basic validation for time range
     if desired_start_time >= desired_end_time:
         print("Error: Desired end time must be after desired start time.")
         return []
 
-    # 1. Filter Availability slots by day of the week
-    # 2. Filter for availability slots where the desired range fits entirely within
-    #    the tutor's available slot.
-    #    This means:
-    #    - The availability slot's start_time must be less than or equal to the desired_start_time.
-    #    - The availability slot's end_time must be greater than or equal to the desired_end_time.
-    available_slots = Availability.objects.filter(
+    # A tutor qualifies when one of their availability slots on that day
+    # covers the whole desired range: it starts at or before the desired
+    # start and ends at or after the desired end.
+    covering_slot = Availability.objects.filter(
+        tutor=OuterRef('pk'),
         day_of_week=day_of_week,
-        start_time__lte=desired_start_time, # Availability starts before or at desired start
-        end_time__gte=desired_end_time      # Availability ends after or at desired end
-    ).select_related('tutor') # Optimize by pre-fetching related Tutor objects
-
-    # Extract unique tutors from the filtered availability slots
-    # Using a set to ensure uniqueness of tutors
-    found_tutors = set()
-    for slot in available_slots:
-        found_tutors.add(slot.tutor)
-
-    # Convert the set back to a list for consistent return type
-    return list(found_tutors)
-
-
+        start_time__lte=desired_start_time,
+        end_time__gte=desired_end_time,
+    )
+    tutors = TeacherProfile.objects.filter(Exists(covering_slot))
+    if eligible_only:
+        # Precomputed on write (base.eligibility): a single predicate served
+        # by teacher_searchable_idx, which also yields the ordering below.
+        tutors = tutors.filter(is_searchable=True)
+    return list(tutors.order_by('-completeness_score', 'id'))
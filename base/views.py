@@ -1,12 +1,33 @@
 
-from rest_framework.decorators import api_view,permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+import mimetypes
+import os
+import re
+from rest_framework.decorators import api_view,permission_classes,renderer_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
-from .utils import calculate_distance
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.db.models import Q, prefetch_related_objects
+from django.utils.dateparse import parse_date, parse_time
+from django.shortcuts import get_object_or_404
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenRefreshView
+from .locations import ingest as ingest_location
 from copy  import deepcopy
-from .models import TeacherProfile
-from .serializer import TeacherProfileSerializer
+from .models import TeacherProfile, AcademicProfile, Availability, Qualification, StoredBlob, Booking
+from .booking import BookingError, SlotUnavailable, book_slot, cancel_booking as cancel_booking_slot
+from .storage import CHUNK_SIZE
+from .sync import CursorExpired, changes_since
+from .autocomplete import autocomplete as autocomplete_taxonomy
+from .calendar import free_slots as tutor_free_slots, horizon, ical_export
+from . import supply
+from .export import TUTOR_PREFETCH, accepts_gzip, gzip_stream, iter_tutors
+from .utils import find_available_tutors
+from .serializer import TeacherProfileSerializer, BookingSerializer
+from .metrics import registry, render_prometheus
+from .authentication import refresh_flight, token_digest
+from .renderers import ICalendarRenderer, NDJSONRenderer
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -25,39 +46,46 @@ def protected_view(request):
     return Response({"detail": f"This is a protected view, accessed by {request.user.first_name} {request.user.last_name}!"})
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Admin-only view exposing the metrics of all worker processes in the
+    Prometheus text format.
+    """
+    return HttpResponse(
+        render_prometheus(*registry.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def set_location(request):
     """
     A protected view to set the user's location.
-    Expects a JSON body with a 'location' field.
+    Expects a JSON body with a 'location' field ("lat,lon,accuracy").
+    Moves of 200 meters or more must be confirmed with "update": true;
+    smaller moves are ignored. Confirmed updates are buffered and written
+    in batches, see base.locations.
     """
-    print("initiated set_location view")
     location = request.data.get('location')
     if not location:
         return Response({"error": "Location is required."}, status=400)
-    # Check if user already has a location
-    previous_location = getattr(request.user, "location", None)
-    update_param = request.data.get("update", False)
-
-    
-    if previous_location:
-        distance = calculate_distance(previous_location, location)
-        print(f"Previous location: {previous_location}, New location: {location}, Distance: {distance} km")
-        if distance is not None and distance >= .2 and not update_param:
-            return Response(
-                {
-                    "detail": "Location update available. The new location is more than 200 meters away from the previous location.",
-                    "distance_km": round(distance, 3),
-                    "update_required": True
-                },
-                status=200
-            )
-        else:
-            return Response({"detail": "Location don't need to be updated. The new location is within 200 meters of the previous location."},status=200)
-    user = request.user
-    user.location = location
-    user.save()
+    outcome, distance = ingest_location(request.user, location, confirmed=bool(request.data.get("update", False)))
+    if outcome == 'invalid':
+        return Response({"error": "Location must be 'lat,lon,accuracy'."}, status=400)
+    if outcome == 'confirm':
+        return Response(
+            {
+                "detail": "Location update available. The new location is more than 200 meters away from the previous location.",
+                "distance_km": round(distance, 3),
+                "update_required": True
+            },
+            status=200
+        )
+    if outcome == 'unchanged':
+        return Response({"detail": "Location don't need to be updated. The new location is within 200 meters of the previous location."},status=200)
     return Response({"detail": "Location updated successfully."}, status=200)
 
 
@@ -68,8 +96,7 @@ def create_teacher(request):
     if not teacher.exists():
         data = deepcopy(request.data)
         data['user'] = request.user.id
-        print(data)
-        serializer = TeacherProfileSerializer(data=data)
+        serializer = TeacherProfileSerializer(data=data, context={'request': request})
         if serializer.is_valid(raise_exception=True):
             serializer.save()
             request.user.is_teacher = True
@@ -79,9 +106,363 @@ def create_teacher(request):
         
     else:
         return Response({"detail": "Teacher profile already exists."}, status=status.HTTP_400_BAD_REQUEST)
-   
-    
 
 
+CERTIFICATE_MODELS = {
+    'academic': AcademicProfile,
+    'qualification': Qualification,
+}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _read_range(handle, length):
+    try:
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def _ranged_file_response(request, field_file, filename):
+    """
+    Serves a stored file with ETag/If-None-Match and single byte-range support.
+    Content-addressed blobs never change, so they are cacheable forever.
+    """
+    storage, name = field_file.storage, field_file.name
+    blob = StoredBlob.objects.filter(pk=os.path.basename(name)).first()
+    if blob is not None:
+        size, content_type, etag = blob.size, blob.content_type, f'"{blob.digest}"'
+    else:
+        size = storage.size(name)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        etag = None
+
+    if etag and request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+    match = RANGE_RE.match(request.headers.get('Range', ''))
+    if match is None:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        elif last:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = 0, -1
+        if start >= size or start > end:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        handle = storage.open(name, 'rb')
+        handle.seek(start)
+        response = StreamingHttpResponse(
+            _read_range(handle, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'inline; filename="{filename}{mimetypes.guess_extension(content_type) or ""}"'
+    if etag:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def certificate_download(request, kind, pk):
+    """
+    Downloads the certificate of an academic profile or qualification.
+    Only the owning teacher and staff may access it.
+    """
+    model = CERTIFICATE_MODELS.get(kind)
+    if model is None:
+        raise Http404
+    document = get_object_or_404(model.objects.select_related('teacher'), pk=pk)
+    if not (request.user.is_staff or document.teacher.user_id == request.user.id):
+        return Response({"detail": "You do not have access to this certificate."}, status=status.HTTP_403_FORBIDDEN)
+    if not document.certificates:
+        raise Http404
+    return _ranged_file_response(request, document.certificates, f"{kind}-{pk}")
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Returns teacher profile and availability upserts/deletes logged after
+    the `cursor` query parameter. Clients store the returned cursor and keep
+    calling while `has_more` is true.
+    """
+    try:
+        cursor = int(request.query_params.get('cursor', 0))
+        limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+    except ValueError:
+        return Response({"error": "cursor and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+    if cursor < 0 or (limit is not None and limit < 1):
+        return Response({"error": "cursor must be >= 0 and limit >= 1."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(changes_since(cursor, limit, request=request))
+    except CursorExpired:
+        return Response(
+            {"detail": "Cursor is too old, a full resync is required.", "reset_required": True},
+            status=status.HTTP_410_GONE,
+        )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    """
+    Suggests subjects and grades for a partial name or subject code, in
+    English or Bangla. Optional `type` (subject/grade) and `limit` parameters.
+    """
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('type')
+    if kind not in (None, 'subject', 'grade'):
+        return Response({"error": "type must be 'subject' or 'grade'."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+    results = autocomplete_taxonomy(query, limit=limit, kind=kind)
+    return Response({"results": [suggestion._asdict() for suggestion in results]})
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def bookings(request):
+    """
+    GET lists the user's upcoming and past bookings, as student or tutor.
+    POST books a slot: {"tutor": <teacher profile id>, "date": "YYYY-MM-DD",
+    "start_time": "HH:MM", "end_time": "HH:MM"}. Taken or unavailable
+    slots are answered with 409.
+    """
+    if request.method == 'GET':
+        queryset = Booking.objects.filter(Q(student=request.user) | Q(tutor__user=request.user))
+        if request.query_params.get('status'):
+            queryset = queryset.filter(status=request.query_params['status'])
+        return Response(BookingSerializer(queryset, many=True, context={'request': request}).data)
+
+    serializer = BookingSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    if data['tutor'].user_id == request.user.id:
+        return Response({"error": "You cannot book yourself."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        booking = book_slot(data['tutor'].pk, request.user, data['date'], data['start_time'], data['end_time'])
+    except SlotUnavailable as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+    except BookingError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(BookingSerializer(booking, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_booking(request, pk):
+    """Cancels a booking; allowed for its student and its tutor."""
+    booking = get_object_or_404(
+        Booking.objects.filter(Q(student=request.user) | Q(tutor__user=request.user)), pk=pk
+    )
+    if not cancel_booking_slot(booking):
+        return Response({"error": "Booking is not confirmed."}, status=status.HTTP_409_CONFLICT)
+    return Response(BookingSerializer(booking, context={'request': request}).data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def tutor_search(request):
+    """
+    Lists the searchable tutors available on `day` (MON..SUN) for the whole
+    of `start`-`end` (HH:MM), most complete profiles first. Eligibility is
+    the precomputed TeacherProfile.is_searchable flag, see base.eligibility.
+    """
+    day = request.query_params.get('day', '')
+    try:
+        start = parse_time(request.query_params.get('start', ''))
+        end = parse_time(request.query_params.get('end', ''))
+    except ValueError:
+        start = end = None
+    if day not in dict(Availability.DAY_CHOICES) or start is None or end is None:
+        return Response({"error": "day (MON..SUN), start and end (HH:MM) are required."}, status=status.HTTP_400_BAD_REQUEST)
+    if start >= end:
+        return Response({"error": "start must be before end."}, status=status.HTTP_400_BAD_REQUEST)
+    tutors = find_available_tutors(day, start, end, eligible_only=True)
+    prefetch_related_objects(tutors, *TUTOR_PREFETCH)
+    return Response({"results": TeacherProfileSerializer(tutors, many=True).data})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def free_slots(request, pk):
+    """
+    Lists a tutor's bookable time between the `start` and `end` dates
+    (YYYY-MM-DD, inclusive). Both default to the materialized window of
+    CALENDAR_HORIZON_DAYS starting today, which also bounds the range.
+    """
+    tutor = get_object_or_404(TeacherProfile, pk=pk)
+    first, last = horizon()
+    try:
+        start = parse_date(request.query_params['start']) if 'start' in request.query_params else first
+        end = parse_date(request.query_params['end']) if 'end' in request.query_params else last
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return Response({"error": "start and end must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({"error": "start must not be after end."}, status=status.HTTP_400_BAD_REQUEST)
+    if end > last:
+        return Response({"error": f"end must not be after {last.isoformat()}."}, status=status.HTTP_400_BAD_REQUEST)
+    slots = tutor_free_slots(tutor.pk, max(start, first), end)
+    return Response({"tutor": tutor.pk, "slots": [slot._asdict() for slot in slots]})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@renderer_classes([ICalendarRenderer, JSONRenderer])
+def tutor_calendar(request, pk):
+    """
+    Streams a tutor's free slots over the materialized window as an
+    iCalendar file. The tutor (and staff) also get their confirmed bookings.
+    """
+    tutor = get_object_or_404(TeacherProfile.objects.select_related('user'), pk=pk)
+    include_bookings = request.user.is_staff or request.user.id == tutor.user_id
+    response = StreamingHttpResponse(
+        ical_export(tutor, include_bookings=include_bookings),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="tutor-{tutor.pk}.ics"'
+    return response
+
+
+# Upper bound on the cells one heatmap request may cover.
+MAX_HEATMAP_CELLS = 4096
+
+
+def _supply_filters(request):
+    return {
+        'subject': int(request.query_params.get('subject', supply.ANY)),
+        'teaching_mode': int(request.query_params.get('teaching_mode', supply.ANY)),
+    }
+
+
+def _supply_cells(zoom, x_range, y_range, filters):
+    return [
+        {"x": x, "y": y, "count": count, "bounds": supply.tile_bounds(zoom, x, y)}
+        for x, y, count in supply.heatmap(zoom, x_range, y_range, **filters)
+    ]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def supply_heatmap(request):
+    """
+    Tutor counts per map cell at `zoom`, inside `bbox` (west,south,east,north
+    in degrees). Optional `subject` and `teaching_mode` ids narrow the counts.
+    """
+    config = supply.get_config()
+    try:
+        zoom = int(request.query_params['zoom'])
+        west, south, east, north = (float(part) for part in request.query_params['bbox'].split(','))
+        filters = _supply_filters(request)
+    except (KeyError, ValueError):
+        return Response(
+            {"error": "zoom and bbox (west,south,east,north) are required; ids must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not config['MIN_ZOOM'] <= zoom <= config['MAX_ZOOM']:
+        return Response(
+            {"error": f"zoom must be between {config['MIN_ZOOM']} and {config['MAX_ZOOM']}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    south, north = max(south, -85.0511), min(north, 85.0511)
+    west_x, north_y = supply.tile_for(north, max(west, -180), zoom)
+    east_x, south_y = supply.tile_for(south, min(east, 180), zoom)
+    if west_x > east_x or north_y > south_y:
+        return Response({"error": "bbox is empty."}, status=status.HTTP_400_BAD_REQUEST)
+    if (east_x - west_x + 1) * (south_y - north_y + 1) > MAX_HEATMAP_CELLS:
+        return Response({"error": "bbox covers too many cells, zoom out."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"zoom": zoom, "cells": _supply_cells(zoom, (west_x, east_x), (north_y, south_y), filters)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def supply_tile(request, zoom, x, y):
+    """
+    The heatmap cells inside map tile zoom/x/y, SUPPLY_HEATMAP['TILE_DETAIL']
+    levels deeper (clamped to the aggregated zoom levels).
+    """
+    config = supply.get_config()
+    try:
+        filters = _supply_filters(request)
+    except ValueError:
+        return Response({"error": "subject and teaching_mode must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+    if zoom > 30 or x >= 2 ** zoom or y >= 2 ** zoom:
+        raise Http404
+    detail = min(max(zoom + config['TILE_DETAIL'], config['MIN_ZOOM']), config['MAX_ZOOM'])
+    if detail >= zoom:
+        shift = detail - zoom
+        x_range, y_range = (x << shift, ((x + 1) << shift) - 1), (y << shift, ((y + 1) << shift) - 1)
+    else:
+        shift = zoom - detail
+        x_range, y_range = (x >> shift, x >> shift), (y >> shift, y >> shift)
+    response = Response({"zoom": detail, "cells": _supply_cells(detail, x_range, y_range, filters)})
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([JSONRenderer, NDJSONRenderer])
+def export_tutors(request):
+    """
+    Streams the whole tutor directory as NDJSON, one serialized teacher
+    profile per line, gzip-compressed when the client accepts it.
+    """
+    chunks = iter_tutors()
+    response_kwargs = {'content_type': 'application/x-ndjson; charset=utf-8'}
+    use_gzip = accepts_gzip(request.headers.get('Accept-Encoding', ''))
+    response = StreamingHttpResponse(gzip_stream(chunks) if use_gzip else chunks, **response_kwargs)
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = 'attachment; filename="tutors.ndjson"'
+    return response
+
+
+class CoalescedTokenRefreshView(TokenRefreshView):
+    """
+    simplejwt's refresh endpoint, computing each refresh token's new access
+    token once: concurrent or repeated refreshes of the same token (several
+    tabs, retries after a timeout) share the result, see SingleFlight.
+    """
+
+    def post(self, request, *args, **kwargs):
+        refresh = request.data.get('refresh')
+        if not isinstance(refresh, str):
+            return super().post(request, *args, **kwargs)
 
+        def compute():
+            serializer = self.get_serializer(data=request.data)
+            try:
+                serializer.is_valid(raise_exception=True)
+            except TokenError as e:
+                raise InvalidToken(e.args[0])
+            return serializer.validated_data
 
+        data, shared = refresh_flight.do(token_digest(refresh), compute)
+        registry.inc('tutoria_token_refresh_total', (('result', 'shared' if shared else 'computed'),))
+        return Response(data, status=status.HTTP_200_OK)
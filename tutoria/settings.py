@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'base.middleware.MetricsMiddleware',
+    'base.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,45 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL instrumentation, see base.middleware.QueryInstrumentationMiddleware.
+QUERY_INSTRUMENTATION = {
+    "SLOW_REQUEST_MS": 500,
+    "SLOW_QUERY_COUNT": 50,
+    "SAMPLE_RATE": 0.1,
+}
+
+# In-process metrics shared between workers through DIR, see base.metrics.
+METRICS = {
+    "DIR": BASE_DIR / "var" / "metrics",
+    "FLUSH_INTERVAL": 5.0,
+}
+
+# Incremental sync feed for mobile clients, see base.sync.
+SYNC_FEED = {
+    "PAGE_SIZE": 500,
+    "RETENTION_DAYS": 30,
+}
+
+# Days of weekly availability materialized as dated calendar slots; the
+# extend_calendar command moves the window forward nightly.
+CALENDAR_HORIZON_DAYS = 56
+
+# set_location write coalescing, see base.locations. The buffer is per
+# worker process: workers see each other's moves only once flushed, so
+# jitter filtering can differ between them for up to FLUSH_INTERVAL seconds.
+LOCATION_INGEST = {
+    "MIN_DISTANCE_KM": 0.2,
+    "FLUSH_INTERVAL": 2.0,
+    "MAX_PENDING": 5000,
+}
+
+# Tutor supply heatmap (Web Mercator tiles), see base.supply.
+SUPPLY_HEATMAP = {
+    "MIN_ZOOM": 5,
+    "MAX_ZOOM": 13,
+    "TILE_DETAIL": 3,
+}
+
 ROOT_URLCONF = 'tutoria.urls'
 AUTH_USER_MODEL = 'base.CustomUser'
 
@@ -62,11 +104,46 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'base.authentication.JWTAuthentication',
         # 'base.authentication.GoogleIDTokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        # Compact format for mobile clients, when msgpack is installed.
+        *(['base.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    ],
+    # Token buckets for write requests, per user and URL name, see
+    # base.throttling. "write" applies to write endpoints not listed.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'base.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'write': '120/min',
+        'base:set_location': '30/min',
+        'base:create_teacher': '10/hour',
+        'token_obtain_pair': '20/min',
+        # Per refresh token, not per IP; clients refresh every few minutes.
+        'token_refresh': '10/min',
+    },
+}
+
+# Reverse proxies (addresses or CIDR networks) whose X-Forwarded-For header
+# the throttle believes; requests from anywhere else are keyed by
+# REMOTE_ADDR. Add the load balancer's address when deploying behind one.
+THROTTLE_TRUSTED_PROXIES = ['127.0.0.1', '::1']
+
+# Shared state of the write throttle (see base.throttling): a memory-mapped
+# file all worker processes on this host open.
+THROTTLE_STATE = {
+    'FILE': BASE_DIR / 'var' / 'throttle.bin',
+    'SLOTS': 65536,
 }
 
+# Test runs keep throttle state and metrics (files shared by workers) in
+# memory, see base.testing.TestRunner.
+TEST_RUNNER = 'base.testing.TestRunner'
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -81,6 +158,12 @@ SIMPLE_JWT = {
     "VERIFYING_KEY": "k2PA1Sr+3J3wvmt8soLu9/b1MpGH6HXo8renBLhS8+U=",
 
 }
+
+# Validated access token cache and refresh deduplication, see base.authentication.
+JWT_CACHE = {
+    "CLAIMS_MAX_ENTRIES": 10000,
+    "REFRESH_RESULT_TTL": 5.0,
+}
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -146,6 +229,16 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (certificates)
+
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = 'media/'
+
+# Stream uploads to disk and hash them on the way, see base.storage.
+FILE_UPLOAD_HANDLERS = [
+    'base.storage.HashingFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
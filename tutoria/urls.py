@@ -16,12 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenObtainPairView
+from base.views import CoalescedTokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('base.urls')),  # Include the base app's URLs
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', CoalescedTokenRefreshView.as_view(), name='token_refresh'),
     path('api/', include('rest_framework.urls')),  # Include DRF's authentication URLs
 ]
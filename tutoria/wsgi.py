@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tutoria.settings')
 
 application = get_wsgi_application()
+
+# Load reference data before the first request instead of during it.
+from base.taxonomy import taxonomy_cache  # noqa: E402
+
+taxonomy_cache.warm()